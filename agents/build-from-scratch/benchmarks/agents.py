@@ -0,0 +1,329 @@
+"""Benchmarks the three agent architectures offline, against a scripted fake model.
+
+Runs chapter-2's `execute_react_agent`, chapter-3's `call_llm` and chapter-4's `call_agent`
+(single-pass, and with its re-phrasing call) against `common.fake_ollama`, whose replies are
+scripted per scenario: the model asks for the scenario's tool calls, then answers. Latency
+and token costs are configurable, so the numbers are deterministic and need no network, GPU
+or Ollama install. For each architecture and scenario it reports the agent iterations, LLM
+round-trips, prompt and completion tokens, tool calls, time spent in tools and wall time,
+averaged over the repeats. A run that doesn't call exactly the scenario's tools (e.g. an
+agent stuck on parse errors) stops the benchmark rather than skewing the numbers.
+
+    uv run python -m benchmarks.agents --latency 0.05 --prompt-token-latency 0.0001
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from dataclasses import dataclass, field
+from common.chapters import load_chapter
+from common.fake_ollama import FakeOllama
+from common.tracing import Tracer
+
+# chapter-4 runs in its default single-pass mode, and with the extra re-phrasing call
+ARCHITECTURES = ["chapter-2", "chapter-3", "chapter-4", "chapter-4+rephrase"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    question: str
+    calls: list[tuple[str, dict]]
+    answer: str
+
+
+SCENARIOS = [
+    Scenario(
+        "no-tool",
+        "How often should I walk my dog?",
+        [],
+        "Most dogs need a walk at least twice a day.",
+    ),
+    Scenario(
+        "breed",
+        "Can you tell me something about my labrador dog?",
+        [("get_breed_info", {"breed": "labrador", "animal_type": "dog"})],
+        "Labradors are prone to hip dysplasia and obesity.",
+    ),
+    Scenario(
+        "symptoms",
+        "My dog is coughing, what could be the problem?",
+        [("check_symptoms", {"animal_type": "dog", "symptoms": "coughing"})],
+        "Coughing can indicate kennel cough or heart disease.",
+    ),
+    Scenario(
+        "breed+symptoms",
+        "My labrador is coughing, should I be worried?",
+        [
+            ("get_breed_info", {"breed": "labrador", "animal_type": "dog"}),
+            ("check_symptoms", {"animal_type": "dog", "symptoms": "coughing"}),
+        ],
+        "Labradors are prone to heart disease; a cough is worth a vet visit.",
+    ),
+]
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text") or "" for part in content)
+    return content or ""
+
+
+class ScriptedModel:
+    """The fake model's brain: replays one scenario, whatever the agent's prompt format.
+
+    - ReAct prompts get one `Action:` per Observation still missing, then a Final Answer.
+    - Tool-calling requests get all the scenario's tool calls at once, then the answer
+      (through smolagents' `final_answer` tool when it is offered).
+    - Any other request (a plain chat) gets the answer.
+    """
+
+    def __init__(self):
+        self.scenario: Scenario | None = None
+        self.tool_steps = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: dict) -> dict:
+        scenario = self.scenario
+        messages = request.get("messages") or []
+        tools = [tool["function"]["name"] for tool in request.get("tools") or []]
+        prompt = "\n".join(_text(message.get("content")) for message in messages)
+
+        if not tools and "Action Input:" in prompt:
+            done = prompt.split("Begin!")[-1].count("Observation:")
+            if done < len(scenario.calls):
+                name, arguments = scenario.calls[done]
+                self._count_step()
+                return {
+                    "content": f"I should use {name}.\nAction: {name}\n"
+                    f"Action Input: {json.dumps(arguments)}\nObservation:"
+                }
+            return {
+                "content": f"I now know the final answer\nFinal Answer: {scenario.answer}"
+            }
+
+        if tools:
+            observed = any(
+                message.get("role") == "tool"
+                or "Observation:" in _text(message.get("content"))
+                for message in messages
+                if message.get("role") != "system"
+            )
+            if not observed and scenario.calls:
+                self._count_step()
+                return {
+                    "content": "",
+                    "tool_calls": [
+                        {"function": {"name": name, "arguments": arguments}}
+                        for name, arguments in scenario.calls
+                    ],
+                }
+            if "final_answer" in tools:
+                # smolagents can only finish through its final_answer tool
+                return {
+                    "content": "",
+                    "tool_calls": [
+                        {
+                            "function": {
+                                "name": "final_answer",
+                                "arguments": {"answer": scenario.answer},
+                            }
+                        }
+                    ],
+                }
+
+        return {"content": scenario.answer}
+
+    def _count_step(self) -> None:
+        with self._lock:
+            self.tool_steps += 1
+
+
+@dataclass
+class ToolTimer:
+    """Times tool executions, optionally adding a simulated latency to each, and records
+    which tools ran."""
+
+    latency: float = 0.0
+    calls: int = 0
+    seconds: float = 0.0
+    names: list[str] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def wrap(self, func, name: str | None = None):
+        """Times `func`: a tool named `name`, else a registry's `call(name, arguments)`."""
+        if getattr(func, "timer", None) is self:
+            return func
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                time.sleep(self.latency)
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.calls += 1
+                    self.seconds += time.perf_counter() - start
+                    self.names.append(name or args[0])
+
+        timed.timer = self
+        return timed
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.names = []
+
+
+def load_architecture(chapter: str, timer: ToolTimer):
+    """Loads a chapter and returns a `run(question) -> answer` function for it."""
+    module = load_chapter(chapter.split("+")[0])
+
+    if chapter == "chapter-2":
+        module.TRACER = Tracer()
+        module.TOOLS.call = timer.wrap(module.TOOLS.call)
+
+        def run(question: str) -> str:
+            # Measure the tools themselves, not the cross-run result cache
+            module.TOOL_RESULT_CACHE.clear()
+            return module.execute_react_agent(
+                question, module.tools_manifest(module.TOOLS), module.TOOLS
+            )
+
+        return run
+
+    if chapter == "chapter-3":
+        module.TRACER = Tracer()
+        module.TOOL_REGISTRY.call = timer.wrap(module.TOOL_REGISTRY.call)
+
+        def run(question: str) -> str:
+            module.TOOL_RESULT_CACHE.clear()
+            return module.call_llm(question)
+
+        return run
+
+    from smolagents import LogLevel
+
+    module.TRACER = Tracer()
+    for agent_tool in module.get_tools():
+        agent_tool.forward = timer.wrap(agent_tool.forward, agent_tool.name)
+
+    def quiet_agent():
+        agent = module.new_agent()
+        agent.logger.level = LogLevel.OFF
+        return agent
+
+    module.AGENT_POOL.factory = quiet_agent
+    # Pay the deferred smolagents and litellm setup before anything is timed
+    with module.AGENT_POOL.checkout():
+        pass
+
+    rephrase = chapter.endswith("+rephrase")
+
+    def run(question: str) -> str:
+        return module.call_agent(question, rephrase=rephrase)
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", choices=ARCHITECTURES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds per LLM call"
+    )
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.001,
+        help="seconds per completion token",
+    )
+    parser.add_argument(
+        "--prompt-token-latency",
+        type=float,
+        default=0.00002,
+        help="seconds per prompt token",
+    )
+    parser.add_argument(
+        "--tool-latency", type=float, default=0.01, help="seconds per tool call"
+    )
+    args = parser.parse_args()
+
+    model = ScriptedModel()
+    timer = ToolTimer(latency=args.tool_latency)
+    fake = FakeOllama(
+        model,
+        latency=args.latency,
+        token_latency=args.token_latency,
+        prompt_token_latency=args.prompt_token_latency,
+    ).start()
+
+    # The chapters read these when they are imported; nothing may reach a real server
+    os.environ["OLLAMA_HOST"] = fake.url
+    os.environ["OLLAMA_API_BASE"] = fake.url
+    os.environ["OLLAMA_MODEL"] = "fake"
+    os.environ["OLLAMA_TOOL_CALLING_MODEL"] = "fake"
+    os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
+
+    print(
+        f"{'architecture':<20}{'scenario':<16}{'iters':>6}{'round-trips':>13}"
+        f"{'prompt tok':>12}{'compl tok':>11}{'tools':>7}{'tool ms':>9}{'wall ms':>10}"
+    )
+    try:
+        for chapter in args.only or ARCHITECTURES:
+            run = load_architecture(chapter, timer)
+            totals = [0.0] * 7
+            for scenario in SCENARIOS:
+                model.scenario = scenario
+                row = [0.0] * 7
+                for _ in range(args.repeat):
+                    fake.requests.clear()
+                    model.tool_steps = 0
+                    timer.reset()
+
+                    start = time.perf_counter()
+                    run(scenario.question)
+                    wall = time.perf_counter() - start
+
+                    expected = sorted(name for name, _ in scenario.calls)
+                    if sorted(timer.names) != expected:
+                        raise SystemExit(
+                            f"{chapter} {scenario.name}: called {sorted(timer.names)}, "
+                            f"expected {expected}; the numbers would be meaningless"
+                        )
+
+                    chats = [r for r in fake.requests if "eval_count" in r]
+                    for index, value in enumerate(
+                        (
+                            model.tool_steps + 1,
+                            len(chats),
+                            sum(r["prompt_eval_count"] for r in chats),
+                            sum(r["eval_count"] for r in chats),
+                            timer.calls,
+                            timer.seconds * 1000,
+                            wall * 1000,
+                        )
+                    ):
+                        row[index] += value / args.repeat
+
+                print(f"{chapter:<20}{scenario.name:<16}" + _format(row))
+                totals = [total + value for total, value in zip(totals, row)]
+            print(f"{chapter:<20}{'total':<16}" + _format(totals))
+            print()
+    finally:
+        fake.stop()
+
+
+def _format(row: list[float]) -> str:
+    iterations, trips, prompt, completion, calls, tool_ms, wall_ms = row
+    return (
+        f"{iterations:>6.1f}{trips:>13.1f}{prompt:>12.0f}{completion:>11.0f}"
+        f"{calls:>7.1f}{tool_ms:>9.1f}{wall_ms:>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
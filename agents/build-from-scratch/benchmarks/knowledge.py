@@ -0,0 +1,108 @@
+"""Times fuzzy breed lookups in a knowledge store with tens of thousands of breeds.
+
+Builds a `TrigramIndex` of synthetic breed names shaped like real ones ('english
+valomir spaniel'), so that the common words ('terrier', 'spaniel') give the query's
+trigrams long postings lists, then times lookups of misspelled names and of names that
+match nothing. Exits non-zero when the mean lookup is slower than `--target-ms`.
+
+    uv run python -m benchmarks.knowledge --breeds 50000
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+from common.knowledge import TrigramIndex
+
+ORIGINS = [
+    "american", "english", "french", "german", "irish", "scottish", "welsh",
+    "russian", "japanese", "australian", "swiss", "dutch", "spanish", "italian",
+    "belgian", "norwegian", "tibetan", "chinese", "portuguese", "polish",
+]  # fmt: skip
+KINDS = [
+    "terrier", "spaniel", "retriever", "shepherd", "hound", "setter", "pointer",
+    "mastiff", "sheepdog", "collie", "poodle", "bulldog", "pinscher", "schnauzer",
+    "shorthair", "longhair", "rex", "forest cat", "wirehair",
+]  # fmt: skip
+CONSONANTS = "bcdfghjklmnprstvwz"
+VOWELS = "aeiouy"
+
+
+def syllable(rng: random.Random) -> str:
+    return rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(["", *CONSONANTS])
+
+
+def breed_names(count: int, seed: int = 0) -> list[str]:
+    """`count` distinct names like 'english valomir spaniel', the same for the same seed."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        word = "".join(syllable(rng) for _ in range(rng.randint(2, 3)))
+        parts = [rng.choice(ORIGINS)] if rng.random() < 0.6 else []
+        names.add(" ".join([*parts, word, rng.choice(KINDS)]))
+    return sorted(names)
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """Swaps two adjacent letters of the name's longest word."""
+    words = name.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    i = rng.randrange(len(word) - 1)
+    words[longest] = word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+    return " ".join(words)
+
+
+def build_index(names: list[str]) -> TrigramIndex[str]:
+    index: TrigramIndex[str] = TrigramIndex()
+    for name in names:
+        index.add(name, name)
+    return index
+
+
+def time_lookups(index: TrigramIndex, queries: list[str]) -> list[float]:
+    """Each query's lookup time, in milliseconds."""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--breeds", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--target-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    names = breed_names(args.breeds)
+    start = time.perf_counter()
+    index = build_index(names)
+    print(f"indexed {len(index)} breeds in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(1)
+    typos = [misspell(name, rng) for name in rng.sample(names, args.queries)]
+    # Made-up names that share no word with any breed
+    unknown = [
+        " ".join(syllable(rng) * 2 for _ in range(2)) for _ in range(args.queries)
+    ]
+
+    slowest = 0.0
+    print(f"{'queries':<10}{'found':>8}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for label, queries in (("typos", typos), ("unknown", unknown)):
+        found = sum(index.search(query) is not None for query in queries)
+        timings = time_lookups(index, queries)
+        mean = statistics.fmean(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"{label:<10}{found:>8}{mean:>10.3f}{p95:>10.3f}{max(timings):>10.3f}")
+        slowest = max(slowest, mean)
+
+    if slowest > args.target_ms:
+        sys.exit(f"mean lookup {slowest:.3f}ms is over the {args.target_ms}ms target")
+
+
+if __name__ == "__main__":
+    main()
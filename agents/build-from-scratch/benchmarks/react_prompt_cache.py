@@ -0,0 +1,91 @@
+"""Compares prompt processing per ReAct iteration with and without prefix-stable prompting.
+
+Runs chapter-2's `execute_react_agent` against the configured Ollama model in both modes and
+reports, per iteration, how many prompt tokens Ollama actually evaluated (tokens served from its
+prompt cache are not counted) and how long the prompt evaluation and the whole call took.
+Passing `on_response` makes the agent read every step's stream to its end, so each step has
+Ollama's statistics; a step that still ends without them (e.g. a dropped stream) is listed
+but left out of the averages.
+
+    uv run python -m benchmarks.react_prompt_cache
+"""
+
+import argparse
+from common.chapters import load_chapter
+from common.tracing import Tracer
+
+QUESTIONS = [
+    "Can you tell me something about my labrador dog?",
+    "My dog is coughing, what could be the problem?",
+]
+
+
+def run_mode(react_agent, question: str, incremental: bool) -> list[dict]:
+    iterations = []
+
+    def record(iteration, response):
+        iterations.append(
+            {
+                "iteration": iteration,
+                "measured": bool(response.done and response.total_duration),
+                "prompt_eval_count": response.prompt_eval_count or 0,
+                "prompt_eval_ms": (response.prompt_eval_duration or 0) / 1e6,
+                "total_ms": (response.total_duration or 0) / 1e6,
+            }
+        )
+
+    react_agent.execute_react_agent(
+        question,
+        react_agent.tools_manifest(react_agent.TOOLS),
+        react_agent.TOOLS,
+        incremental=incremental,
+        on_response=record,
+    )
+    return iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", nargs="*", default=QUESTIONS)
+    args = parser.parse_args()
+
+    react_agent = load_chapter("chapter-2")
+    react_agent.TRACER = Tracer()
+
+    print(
+        f"{'mode':<12}{'question':<6}{'iter':>5}{'prompt tokens':>15}"
+        f"{'prompt ms':>12}{'total ms':>12}"
+    )
+    measured = {}
+    for mode, incremental in (("rerender", False), ("incremental", True)):
+        rows = measured.setdefault(mode, [])
+        for number, question in enumerate(args.questions):
+            for row in run_mode(react_agent, question, incremental):
+                if not row["measured"]:
+                    print(
+                        f"{mode:<12}{number:<6}{row['iteration']:>5}  (no statistics)"
+                    )
+                    continue
+                print(
+                    f"{mode:<12}{number:<6}{row['iteration']:>5}"
+                    f"{row['prompt_eval_count']:>15}{row['prompt_eval_ms']:>12.1f}"
+                    f"{row['total_ms']:>12.1f}"
+                )
+                rows.append(row)
+
+    print()
+    for mode, rows in measured.items():
+        if not rows:
+            print(f"{mode:<12} no step reported statistics")
+            continue
+        steps = len(rows)
+        print(
+            f"{mode:<12} {steps} steps, per step: prompt tokens "
+            f"{sum(row['prompt_eval_count'] for row in rows) / steps:>7.1f}  prompt "
+            f"{sum(row['prompt_eval_ms'] for row in rows) / steps:>9.1f} ms  total "
+            f"{sum(row['total_ms'] for row in rows) / steps:>9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Measures how long each chapter takes to start: importing it, and then answering once.
+
+Every measurement runs in a fresh interpreter, as a CLI start or a spawned worker would, with
+`-X importtime`. It reports the wall time of the process, the total import time and the
+heaviest top-level imports, first for a bare `load_chapter` (what a REPL or a worker pays
+before it can accept work) and then, with `--first-call`, for the first question answered
+against `common.fake_ollama`, where the deferred imports and construction are paid.
+
+    uv run python -m benchmarks.startup --repeat 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from common.chapters import CHAPTER_SCRIPTS, ROOT
+from common.fake_ollama import FakeOllama
+
+LOAD = "from common.chapters import load_chapter; module = load_chapter({chapter!r})"
+
+# The cheapest complete answer each chapter can give
+FIRST_CALL = {
+    "chapter-1": "module.call_llm('hello', cache=None)",
+    "chapter-2": "module.execute_react_agent('hello', module.tools_manifest(module.TOOLS), module.TOOLS)",
+    "chapter-3": "module.call_llm('hello')",
+    "chapter-4": "module.call_agent('hello')",
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    """The cumulative milliseconds of each top-level import in `-X importtime` output."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented under the module that imported them
+        if name.startswith(" ") and not name.startswith("  ") and cumulative.strip():
+            try:
+                imports[name.strip()] = int(cumulative) / 1000
+            except ValueError:
+                continue
+    return imports
+
+
+def measure(code: str, env: dict) -> tuple[float, dict[str, float]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", choices=list(CHAPTER_SCRIPTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=3, help="heaviest imports to list")
+    parser.add_argument(
+        "--first-call",
+        action="store_true",
+        help="also measure a process that answers one question",
+    )
+    args = parser.parse_args()
+
+    fake = FakeOllama(lambda request: {"content": "Hello!"}).start()
+    env = {
+        **os.environ,
+        "OLLAMA_HOST": fake.url,
+        "OLLAMA_API_BASE": fake.url,
+        "OLLAMA_MODEL": "fake",
+        "OLLAMA_TOOL_CALLING_MODEL": "fake",
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+    }
+
+    modes = [("import", LOAD)]
+    if args.first_call:
+        modes.append(("first call", LOAD + "; {call}"))
+
+    print(
+        f"{'chapter':<12}{'mode':<12}{'wall ms':>10}{'import ms':>11}  heaviest imports"
+    )
+    try:
+        for chapter in args.only or list(CHAPTER_SCRIPTS):
+            for mode, template in modes:
+                code = template.format(chapter=chapter, call=FIRST_CALL[chapter])
+                walls, totals, heaviest = [], [], {}
+                for _ in range(args.repeat):
+                    wall, imports = measure(code, env)
+                    walls.append(wall)
+                    totals.append(sum(imports.values()))
+                    for name, ms in imports.items():
+                        heaviest[name] = heaviest.get(name, 0.0) + ms / args.repeat
+                top = sorted(heaviest.items(), key=lambda item: -item[1])[: args.top]
+                print(
+                    f"{chapter:<12}{mode:<12}{statistics.median(walls):>10.0f}"
+                    f"{statistics.median(totals):>11.0f}  "
+                    + ", ".join(f"{name} {ms:.0f}" for name, ms in top)
+                )
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class MemoryTier:
+    """A small in-process LRU cache holding the most recently used responses."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, ttl: float | None) -> list[str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            created_at, chunks = entry
+            if ttl is not None and time.time() - created_at > ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return chunks
+
+    def set(self, key: str, chunks: list[str], created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (created_at, chunks)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteTier:
+    """An on-disk cache that survives restarts, evicted by age (TTL) and size (LRU)."""
+
+    def __init__(self, path: str, max_entries: int = 10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                chunks TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str, ttl: float | None) -> tuple[float, list[str]] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT chunks, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            chunks, created_at = row
+            now = time.time()
+            if ttl is not None and now - created_at > ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            return created_at, json.loads(chunks)
+
+    def set(self, key: str, chunks: list[str], created_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, chunks, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(chunks), created_at, created_at),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+
+    def purge_expired(self, ttl: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - ttl,)
+            )
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+
+class ResponseCache:
+    """Two-tier (memory + SQLite) cache for deterministic LLM responses.
+
+    Responses are stored as the list of streamed chunks, so a hit can be replayed
+    chunk by chunk to a streaming caller or joined for a blocking one.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        memory_entries: int = 256,
+        disk_entries: int = 10_000,
+        ttl: float | None = None,
+    ):
+        self.ttl = ttl
+        self.memory = MemoryTier(memory_entries)
+        self.disk = SQLiteTier(path, disk_entries) if path else None
+
+        if self.disk and ttl is not None:
+            self.disk.purge_expired(ttl)
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache | None":
+        """Builds the cache from LLM_CACHE* environment variables, or None when disabled."""
+        if os.getenv("LLM_CACHE", "false").lower() != "true":
+            return None
+
+        ttl = os.getenv("LLM_CACHE_TTL")
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3") or None,
+            memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+            disk_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], options: dict) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "options": options},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[str] | None:
+        chunks = self.memory.get(key, self.ttl)
+        if chunks is not None:
+            return chunks
+
+        if self.disk is None:
+            return None
+
+        entry = self.disk.get(key, self.ttl)
+        if entry is None:
+            return None
+
+        # Promote disk hits so the next lookup stays in memory
+        created_at, chunks = entry
+        self.memory.set(key, chunks, created_at)
+        return chunks
+
+    def set(self, key: str, chunks: list[str]) -> None:
+        created_at = time.time()
+        self.memory.set(key, chunks, created_at)
+        if self.disk is not None:
+            self.disk.set(key, chunks, created_at)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
@@ -1,10 +1,42 @@
+from __future__ import annotations
+
 import os
+import sys
 import shutil
-from ollama import chat
-from ollama import ChatResponse
+from pathlib import Path
+from typing import Iterator
 from dotenv import load_dotenv
 
-load_dotenv()
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.batching import gather_bounded
+from common.lazy import lazy_import
+from common.memory import ConversationMemory, count_tokens, make_llm_summarizer
+from common.ollama_pool import OllamaPool, get_ollama_pool
+from common.stream_metrics import (
+    InMemoryAggregator,
+    MetricsSink,
+    StreamRecorder,
+    find_sink,
+    sink_from_env,
+)
+from common.warmup import (
+    keep_alive_policy,
+    print_warmup_report,
+    warm_up,
+    warmup_enabled,
+)
+from response_cache import ResponseCache
+
+ollama = lazy_import("ollama")
+
+load_dotenv(dotenv_path=".env.local")
+
+OLLAMA = get_ollama_pool()
+MODEL = os.getenv("OLLAMA_MODEL", "gemma3:4b")
+RESPONSE_CACHE = ResponseCache.from_env()
+STREAM_METRICS_SINK = sink_from_env()
+KEEP_ALIVE = keep_alive_policy()
 
 SYSTEM_PROMPT = """
 You are a helpful veterinary assistant who's goal is to answer questions about animals and their health. 
@@ -14,39 +46,150 @@ Always respond in a helpful and friendly manner. You do not need to mention abou
 """
 
 
-def call_llm(question: str) -> None:
+def call_llm(
+    question: str,
+    cache: ResponseCache | None = RESPONSE_CACHE,
+    memory: ConversationMemory | None = None,
+) -> None:
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
+        *(memory.messages() if memory else []),
         {"role": "user", "content": question},
     ]
-    response: ChatResponse = chat(
-        model=os.getenv("OLLAMA_MODEL"),
+    options = {"temperature": 0.7, "num_ctx": 1024, "seed": 42}
+
+    cache_key = cache.make_key(MODEL, messages, options) if cache else None
+    cached_chunks = cache.get(cache_key) if cache else None
+    if cached_chunks is not None:
+        print("LLM:", "".join(cached_chunks))
+        if memory:
+            memory.add_turn(question, "".join(cached_chunks))
+        return
+
+    response: ollama.ChatResponse = OLLAMA.chat(
+        model=MODEL,
         messages=messages,
-        options={"temperature": 0.7, "num_ctx": 1024, "seed": 42},
+        options=options,
+        keep_alive=KEEP_ALIVE,
     )
+    if cache:
+        cache.set(cache_key, [response.message.content])
+    if memory:
+        memory.add_turn(question, response.message.content)
     print("LLM:", response.message.content)
 
 
-def call_llm_streaming(question: str) -> None:
-    """Stream the LLM response to terminal in real-time."""
+def stream_llm(
+    question: str,
+    cache: ResponseCache | None = RESPONSE_CACHE,
+    sink: MetricsSink | None = STREAM_METRICS_SINK,
+    memory: ConversationMemory | None = None,
+) -> Iterator[str]:
+    """Yields the LLM response's text as it is generated."""
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
+        *(memory.messages() if memory else []),
         {"role": "user", "content": question},
     ]
-
-    print("LLM: ", end="", flush=True)
-
-    for chunk in chat(
-        model="gemma3:4b",
+    options = {"temperature": 0.7, "num_ctx": 1024, "seed": 42}
+
+    cache_key = cache.make_key(MODEL, messages, options) if cache else None
+    cached_chunks = cache.get(cache_key) if cache else None
+    if cached_chunks is not None:
+        # Replay the cached chunks so callers see the same streaming output
+        yield from cached_chunks
+        if memory:
+            memory.add_turn(question, "".join(cached_chunks))
+        return
+
+    chunks = []
+    stream = OLLAMA.chat(
+        model=MODEL,
         messages=messages,
-        options={"temperature": 0.7, "num_ctx": 1024, "seed": 42},
+        options=options,
         stream=True,
-    ):
+        keep_alive=KEEP_ALIVE,
+    )
+    for chunk in StreamRecorder(MODEL, sink).wrap(stream):
         if chunk.message.content:
-            print(chunk.message.content, end="", flush=True)
+            chunks.append(chunk.message.content)
+            yield chunk.message.content
+
+    # Only complete generations are cached; an interrupted stream raises before here
+    if cache:
+        cache.set(cache_key, chunks)
+    if memory:
+        memory.add_turn(question, "".join(chunks))
+
+
+def call_llm_streaming(
+    question: str,
+    cache: ResponseCache | None = RESPONSE_CACHE,
+    sink: MetricsSink | None = STREAM_METRICS_SINK,
+    memory: ConversationMemory | None = None,
+) -> None:
+    """Stream the LLM response to terminal in real-time."""
+    print("LLM: ", end="", flush=True)
+    for content in stream_llm(question, cache, sink, memory):
+        print(content, end="", flush=True)
     print()
 
 
+async def acall_llm(
+    question: str,
+    client: OllamaPool | None = None,
+    cache: ResponseCache | None = RESPONSE_CACHE,
+) -> str:
+    """Asynchronously asks the LLM a single question and returns the answer."""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": question},
+    ]
+    options = {"temperature": 0.7, "num_ctx": 1024, "seed": 42}
+
+    cache_key = cache.make_key(MODEL, messages, options) if cache else None
+    cached_chunks = cache.get(cache_key) if cache else None
+    if cached_chunks is not None:
+        return "".join(cached_chunks)
+
+    response: ollama.ChatResponse = await (client or OLLAMA).achat(
+        model=MODEL,
+        messages=messages,
+        options=options,
+        keep_alive=KEEP_ALIVE,
+    )
+    if cache:
+        cache.set(cache_key, [response.message.content])
+    return response.message.content
+
+
+async def call_llm_batch(
+    questions: list[str],
+    max_concurrency: int = 8,
+    timeout: float | None = None,
+    cache: ResponseCache | None = RESPONSE_CACHE,
+) -> list[str | Exception]:
+    """Answers many questions concurrently over the shared Ollama pool.
+
+    Args:
+        questions: The questions to answer.
+        max_concurrency: The maximum number of requests in flight at once.
+        timeout: Per-question timeout in seconds.
+
+    Returns:
+        The answers in the same order as the questions. A question that failed or timed out
+        yields its exception instead, so one slow answer never sinks the whole batch.
+    """
+    return await gather_bounded(
+        (
+            lambda question=question: acall_llm(question, client=OLLAMA, cache=cache)
+            for question in questions
+        ),
+        max_concurrency=max_concurrency,
+        timeout=timeout,
+    )
+
+
 def main():
     terminal_width = shutil.get_terminal_size().columns
     print("┌" + "─" * (terminal_width - 2) + "┐")
@@ -68,18 +211,32 @@ def main():
     print("└" + "─" * (terminal_width - 2) + "┘")
     print()
 
+    # Whatever num_ctx leaves after the system prompt, a new question and the answer
+    memory = ConversationMemory.for_context(
+        num_ctx=1024,
+        reserved_tokens=count_tokens(SYSTEM_PROMPT) + 128 + 256,
+        summarize=make_llm_summarizer(MODEL, KEEP_ALIVE),
+    )
+
+    if warmup_enabled():
+        print_warmup_report(warm_up([MODEL], KEEP_ALIVE, OLLAMA))
+        print()
+
     while True:
         try:
             user_input = input("You: ").strip()
 
             if user_input.lower() in ("exit", "quit"):
+                aggregator = find_sink(STREAM_METRICS_SINK, InMemoryAggregator)
+                if aggregator is not None:
+                    print(f"Streaming stats: {aggregator.summary()}")
                 print("Goodbye! Take care of your furry friends!")
                 break
 
             if not user_input:
                 continue
 
-            call_llm_streaming(user_input)
+            call_llm_streaming(user_input, memory=memory)
 
         except KeyboardInterrupt:
             print("\n👋 Interrupted by user. Goodbye!")
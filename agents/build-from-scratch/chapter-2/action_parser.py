@@ -0,0 +1,139 @@
+import re
+
+# Only at the start of a line, so a Thought mentioning "Action:" is not taken for one
+ACTION_PATTERN = re.compile(r"^[ \t]*Action:[ \t]*(\w+)", re.MULTILINE)
+ACTION_INPUT_PATTERN = re.compile(r"^[ \t]*Action Input:", re.MULTILINE)
+CODE_FENCE = "```"
+OBSERVATION_MARKER = "Observation:"
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+def _skip_spaces(text: str, start: int) -> int:
+    while start < len(text) and text[start] in " \t":
+        start += 1
+    return start
+
+
+def _balanced_end(text: str, start: int) -> int | None:
+    """Returns the index just past the bracket that closes the one at `start`, if it arrived.
+
+    Brackets inside JSON strings (including escaped quotes) are ignored.
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return None
+
+
+class StreamingActionParser:
+    """Parses a ReAct step incrementally, as the model streams it.
+
+    Feed it chunks as they arrive. As soon as an `Action:` and a syntactically complete
+    `Action Input:` have been seen, `feed` returns True so the tool can be started while the
+    rest of the generation is still being torn down. JSON inputs are complete when their
+    brackets balance, so they may span several lines, start on the line after the marker
+    or sit in a code fence; any other input ends at the newline.
+    An `Observation:` marker ends the step, since the model must not invent observations.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.action: str | None = None
+        self.action_input: str | None = None
+        self.end: int | None = None
+        self.halted = False
+        self._input_from = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    @property
+    def final_answer(self) -> str | None:
+        if FINAL_ANSWER_MARKER not in self.text:
+            return None
+        return self.text.split(FINAL_ANSWER_MARKER, 1)[1].strip()
+
+    def feed(self, chunk: str) -> bool:
+        """Consumes the next chunk. Returns True once the action is ready to dispatch."""
+        if self.complete or self.halted:
+            return self.complete
+
+        self.text += chunk
+        marker = self.text.find(OBSERVATION_MARKER)
+        if marker != -1:
+            self.text = self.text[:marker]
+            self.halted = True
+
+        self._parse(final=self.halted)
+        return self.complete
+
+    def finish(self) -> None:
+        """Marks the end of the stream, completing inputs that were waiting for a newline."""
+        self.halted = True
+        if not self.complete:
+            self._parse(final=True)
+
+    def _parse(self, final: bool) -> None:
+        text = self.text
+
+        if self.action is None:
+            match = ACTION_PATTERN.search(text)
+            # The name may still be growing if the match runs to the end of the buffer
+            if not match or (match.end() == len(text) and not final):
+                return
+            self.action = match.group(1)
+            self._input_from = match.end()
+
+        marker = ACTION_INPUT_PATTERN.search(text, self._input_from)
+        if not marker:
+            return
+
+        start = _skip_spaces(text, marker.end())
+        if start < len(text) and text[start] == "\n":
+            # A JSON input (or its code fence) may start on the line after the marker
+            if start + 1 == len(text) and not final:
+                return
+            if text[start + 1 : start + 2] in ("{", "[", "`"):
+                start += 1
+        if text.startswith(CODE_FENCE, start):
+            # Skip the fence and its language tag, e.g. ```json
+            newline = text.find("\n", start)
+            if newline == -1:
+                if not final:
+                    return
+                newline = len(text) - 1
+            start = _skip_spaces(text, newline + 1)
+        if start == len(text) and not final:
+            return
+
+        if start < len(text) and text[start] in "{[":
+            end = _balanced_end(text, start)
+        else:
+            newline = text.find("\n", start)
+            end = newline if newline != -1 else None
+
+        if end is None:
+            if not final:
+                return
+            end = len(text)
+
+        self.action_input = text[start:end].strip()
+        self.end = end
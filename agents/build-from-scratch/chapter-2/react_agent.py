@@ -1,15 +1,52 @@
+from __future__ import annotations
+
 import os
-import re
+import sys
 import json
+import time
 import ast
 import shutil
-from ollama import chat
-from ollama import ChatResponse
+from typing import Callable
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
+from action_parser import StreamingActionParser
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.lazy import lazy_import
+from common.memory import ConversationMemory, count_tokens, make_llm_summarizer
+from common.ollama_pool import get_ollama_pool
+from common.tool_memo import TTLCache, ToolMemo
+from common.tool_registry import ToolRegistry
+from common.tracing import (
+    InMemoryExporter,
+    find_exporter,
+    propagate,
+    tracer_from_env,
+)
+from common.warmup import (
+    keep_alive_policy,
+    print_warmup_report,
+    warm_up,
+    warmup_enabled,
+)
+from common.vet_tools import check_symptoms, get_breed_info, search_vet_knowledge
+from scratchpad import Scratchpad
+
+ollama = lazy_import("ollama")
 
 load_dotenv(dotenv_path=".env.local")
 
 LOG_ACTIVITY = os.getenv("LOG_ACTIVITY", "false").lower() == "true"
+OLLAMA = get_ollama_pool()
+MODEL = os.getenv("OLLAMA_MODEL")
+KEEP_ALIVE = keep_alive_policy()
+TRACER = tracer_from_env(console=LOG_ACTIVITY)
+NUM_CTX = 4096
+REACT_INCREMENTAL = os.getenv("REACT_INCREMENTAL", "true").lower() == "true"
+TOOL_RESULT_CACHE = TTLCache(ttl=float(os.getenv("TOOL_CACHE_TTL", "300")))
 
 ###########################################################################################################
 #                                           REACT AGENT                                                   #
@@ -37,28 +74,125 @@ Begin!
 IMPORTANT: You are to provide the steps until action input. Do not make up any information. The user will provide the Observation & Thought.
 If the Observation statisfies the question, you should return the Final Answer.
 
-Question: {input}
+{history}Question: {input}
 Thought:{agent_scratchpad}"""
 
 
-def _parse_action(text):
-    """Parse action and action input from LLM response"""
-    action_pattern = r"Action:\s*(\w+)"
-    input_pattern = r"Action Input:\s*(.+?)(?=\n|$)"
+# The model must stop before it invents an Observation; the user provides those
+REACT_STOP_SEQUENCES = ["Observation:"]
+
+# Tools start on these threads while the model's stream is still open
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="react-tool")
+
+
+@dataclass
+class ReactStep:
+    content: str
+    response: ollama.ChatResponse | None
+    action: str | None = None
+    action_input: str | None = None
+    observation: Future | None = None
+
+
+def _stream_react_step(
+    messages: list[dict], memo: ToolMemo, drain: bool = False
+) -> ReactStep:
+    """Streams one ReAct step, dispatching the tool as soon as its action is complete.
+
+    The chunks are fed to a `StreamingActionParser`. The moment `Action:` and a
+    syntactically complete `Action Input:` have arrived, the tool is submitted to
+    `TOOL_EXECUTOR`, from inside the stream loop; only then is the stream closed, so the tool
+    runs while generation is torn down and no decode time is spent on hallucinated
+    Observation/Thought cycles. An `Observation:` stop sequence ends generation server-side
+    as well. The tool's result is only waited for when the Observation is needed.
+
+    With `drain`, the stream is read to its end instead, while the tool runs, because only
+    the final chunk carries Ollama's token counts and durations. The text after the action
+    is still ignored.
+
+    Returns:
+        The step, with the generated text, the last chunk received (it carries Ollama's timing
+        statistics when the model finished on its own) and the pending tool call, if any.
+    """
+    parser = StreamingActionParser()
+    last_chunk = None
+    observation = None
+    with TRACER.span("llm.call", model=MODEL, messages=len(messages)) as span:
+        if span.recording:
+            span.set(prompt_chars=sum(len(m["content"]) for m in messages))
+        started = time.perf_counter()
+        stream = OLLAMA.chat(
+            model=MODEL,
+            messages=messages,
+            options={
+                "temperature": 0.7,
+                "num_ctx": NUM_CTX,
+                "seed": 42,
+                "stop": REACT_STOP_SEQUENCES,
+            },
+            keep_alive=KEEP_ALIVE,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if last_chunk is None:
+                    span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 1))
+                last_chunk = chunk
+                if parser.complete or parser.halted:
+                    # Only still reading to get the final chunk's statistics
+                    continue
+                if parser.feed(chunk.message.content or ""):
+                    observation = _dispatch_tool(parser, memo)
+                if (parser.complete or parser.halted) and not drain:
+                    break
+        finally:
+            # Closing the stream drops the connection, which makes Ollama stop generating
+            stream.close()
+
+        parser.finish()
+        if observation is None:
+            # An input at the very end of the stream is only complete once it has ended
+            observation = _dispatch_tool(parser, memo)
+        done = last_chunk is not None and last_chunk.done
+        span.set(completion_chars=len(parser.text), cut_short=not done)
+        if done:
+            span.set(
+                prompt_eval_count=last_chunk.prompt_eval_count,
+                eval_count=last_chunk.eval_count,
+            )
 
-    # Find ALL matches
-    action_matches = list(re.finditer(action_pattern, text))
-    input_matches = list(re.finditer(input_pattern, text))
+    content = parser.text[: parser.end] if parser.complete else parser.text
+    step = ReactStep(content=content.rstrip(), response=last_chunk)
+    if last_chunk is not None:
+        last_chunk.message.content = step.content
 
-    # Get the LAST occurrence of each
-    if action_matches and input_matches:
-        last_action = action_matches[-1]  # Last action match
-        last_input = input_matches[-1]  # Last input match
+    if observation is not None:
+        step.action = parser.action
+        step.action_input = parser.action_input
+        step.observation = observation
+    return step
 
-        action = last_action.group(1).strip()
-        action_input = last_input.group(1).strip()
-        return action, action_input
 
+def _dispatch_tool(parser: StreamingActionParser, memo: ToolMemo) -> Future | None:
+    """Starts the parsed action's tool in the background, unless the step is an answer."""
+    if not parser.complete or parser.final_answer is not None:
+        return None
+    return TOOL_EXECUTOR.submit(
+        propagate(memo.call), parser.action, safe_parse_json(parser.action_input)
+    )
+
+
+def _parse_action(text):
+    """Parse action and action input from a complete LLM response.
+
+    Uses the same rules as the streaming parser: the first complete action wins and JSON
+    inputs may span several lines.
+    """
+    parser = StreamingActionParser()
+    parser.feed(text)
+    parser.finish()
+    if parser.complete:
+        return parser.action, parser.action_input
     return None, None
 
 
@@ -76,82 +210,109 @@ def safe_parse_json(action_input: str):
             return {}
 
 
-def call_tool(action: str, action_input: dict, tools: dict):
+def call_tool(action: str, action_input: dict, tools: ToolRegistry):
     """Call the tool with the given action and action input"""
-    if action in tools:
-        tool_function = tools[action]
-        # Extract the required arguments for the tool function
-        tool_args = {
-            k: v
-            for k, v in action_input.items()
-            if k in tool_function.__code__.co_varnames
-        }
-        return tool_function(**tool_args)
-    return "Error: Tool not found"
+    # The registry validates and coerces the arguments against the cached signature
+    return tools.call(action, action_input)
+
 
+def execute_react_agent(
+    input: str,
+    tools_manifest: list[str],
+    tools: ToolRegistry,
+    history: str = "",
+    incremental: bool | None = None,
+    on_response: Callable[[int, ollama.ChatResponse], None] | None = None,
+):
+    """Runs the ReAct loop until the model gives a Final Answer (at most 10 iterations).
 
-def execute_react_agent(input: str, tools_manifest: list[str], tools: dict):
+    Args:
+        input: The question to answer.
+        tools_manifest: The tool descriptions rendered into the prompt.
+        tools: The registry of tools the agent may call.
+        history: The earlier conversation as a transcript, if any.
+        incremental: When True, the rendered template is sent once and every iteration only
+            appends the model's step and the new Observation as chat messages. The prompt then
+            grows by appending to a stable prefix, so Ollama can reuse its KV cache instead of
+            re-processing the tools manifest and scratchpad. When False, the whole template is
+            re-rendered as a single message each iteration. Defaults to REACT_INCREMENTAL.
+            Either way the steps are kept within the context window by a `Scratchpad`.
+        on_response: Called with the iteration number and the last streamed chunk of each
+            step, e.g. to collect prompt-eval statistics. Setting it lets every step's stream
+            run to its end, so that this chunk carries them.
+    """
+    if incremental is None:
+        incremental = REACT_INCREMENTAL
 
-    agent_scratchpad = ""
+    history = f"Conversation so far:\n{history}\n\n" if history else ""
 
     tools_combined = "\n".join(tools_manifest)
     tool_names = ", ".join(tool.split(":")[0].strip() for tool in tools_manifest)
 
-    for iteration in range(10):
-        prompt = REACT_TEMPLATE.format(
-            tools=tools_combined,
-            tool_names=tool_names,
-            input=input,
-            agent_scratchpad=agent_scratchpad,
-        )
+    base_prompt = REACT_TEMPLATE.format(
+        tools=tools_combined,
+        tool_names=tool_names,
+        input=input,
+        history=history,
+        agent_scratchpad="",
+    )
 
-        if LOG_ACTIVITY:
-            print("-" * 80)
-            print(prompt)
-            print("-" * 80)
+    # Whatever the context window leaves after the prompt is the scratchpad's budget
+    scratchpad = Scratchpad.for_context(NUM_CTX, count_tokens(base_prompt))
 
-        messages = [{"role": "user", "content": prompt}]
+    # Repeated actions within this run are answered with a reference to the first Observation
+    memo = ToolMemo(tools, TOOL_RESULT_CACHE, TRACER)
 
-        try:
-            response: ChatResponse = chat(
-                model=os.getenv("OLLAMA_MODEL"),
-                messages=messages,
-                options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
-            )
-        except Exception as e:
-            return f"Error: Failed to get response from model: {e}"
+    with TRACER.span("agent.run", agent="react", incremental=incremental) as run:
+        for iteration in range(10):
+            with TRACER.span("agent.iteration", iteration=iteration) as span:
+                if incremental:
+                    messages = [
+                        {"role": "user", "content": base_prompt},
+                        *scratchpad.messages(),
+                    ]
+                else:
+                    messages = [
+                        {"role": "user", "content": base_prompt + scratchpad.render()}
+                    ]
 
-        response_content = response.message.content
+                try:
+                    step = _stream_react_step(
+                        messages, memo, drain=on_response is not None
+                    )
+                except Exception as e:
+                    run.set(outcome="error")
+                    return f"Error: Failed to get response from model: {e}"
 
-        if LOG_ACTIVITY:
-            print("-" * 80)
-            print(f"Iteration {iteration}:")
-            print(response_content)
-            print("-" * 80)
+                if on_response and step.response is not None:
+                    on_response(iteration, step.response)
 
-        if "Final Answer:" in response_content:
-            return response_content.split("Final Answer:")[1].strip()
+                response_content = step.content
 
-        action, action_input = _parse_action(response_content)
+                if "Final Answer:" in response_content:
+                    run.set(outcome="answer", iterations=iteration + 1)
+                    return response_content.split("Final Answer:")[1].strip()
 
-        if action:
-            observation = call_tool(action, safe_parse_json(action_input), tools)
+                action, action_input = step.action, step.action_input
 
-            if LOG_ACTIVITY:
-                print("-" * 80)
-                print(f"Action: {action}")
-                print(f"Action Input: {action_input}")
-                print(f"Observation: {observation}")
-                print("-" * 80)
+                if action:
+                    span.set(action=action)
 
-            # Update scratchpad
-            agent_scratchpad += (
-                f" {response_content}\nObservation: {observation}\nThought:"
-            )
-        else:
-            agent_scratchpad += f" {response_content}\nThought:"
+                    # The tool has been running since its action streamed in; wait for it now
+                    scratchpad.add(
+                        response_content,
+                        action,
+                        action_input,
+                        step.observation.result(),
+                    )
+                else:
+                    scratchpad.add(response_content)
 
-    return "Error: Failed to get response from model"
+                if span.recording:
+                    span.set(scratchpad_tokens=scratchpad.token_count())
+
+        run.set(outcome="max_iterations", iterations=10)
+        return "Error: Failed to get response from model"
 
 
 ###########################################################################################################
@@ -167,80 +328,25 @@ Always respond in a helpful and friendly manner. You do not need to mention abou
 """
 
 
-def get_breed_info(breed: str, animal_type: str) -> str:
-    """Retrieves breed-specific health information, common conditions, and care requirements.
+# The lookups over the fixed knowledge file may be cached across runs; the passage store
+# takes appends at any time, so searches over it are not
+TOOLS = ToolRegistry()
+TOOLS.register(get_breed_info, pure=True)
+TOOLS.register(check_symptoms, pure=True)
+TOOLS.register(search_vet_knowledge)
 
-    Args:
-        breed: The breed of the animal for which information is requested.
-        animal_type: The type of animal (e.g., 'dog', 'cat').
 
-    Returns:
-        A string containing health information, common conditions, and care requirements for the specified breed.
-        If the breed or animal type is not found, returns a default message with the breed and animal type.
-    """
-    mock_data = {
-        "dog": {
-            "labrador": "Labradors are prone to hip dysplasia and obesity. Regular exercise and a balanced diet are essential.",
-            "poodle": "Poodles often face eye disorders and skin allergies. Regular grooming and vet check-ups are recommended.",
-        },
-        "cat": {
-            "siamese": "Siamese cats can have respiratory issues and dental problems. Regular dental care and a smoke-free environment are beneficial.",
-            "maine coon": "Maine Coons are susceptible to heart disease and hip dysplasia. Regular vet visits and a healthy diet are important.",
-        },
-    }
-
-    return mock_data.get(animal_type.lower(), {}).get(
-        breed.lower(), f"Breed: {breed}, Animal Type: {animal_type}"
-    )
-
-
-def check_symptoms(animal_type: str, symptoms: str) -> str:
-    """Analyzes symptoms and provides an initial assessment for animals.
-
-    Args:
-        animal_type: The type of animal (e.g., 'dog', 'cat').
-        symptoms: A description of the symptoms observed in the animal.
-
-    Returns:
-        A string containing an assessment of the symptoms, including potential conditions and urgency.
-        If the symptoms or animal type are not recognized, returns a message indicating that further assessment is needed.
-    """
-    mock_symptom_data = {
-        "dog": {
-            "coughing": "Coughing in dogs can indicate kennel cough or heart disease. Urgency: Moderate.",
-            "vomiting": "Vomiting may be due to dietary indiscretion or gastrointestinal issues. Urgency: High if persistent.",
-        },
-        "cat": {
-            "sneezing": "Sneezing in cats can be a sign of upper respiratory infection. Urgency: Moderate.",
-            "lethargy": "Lethargy might indicate anemia or infection. Urgency: High if accompanied by other symptoms.",
-        },
-    }
-
-    potential_conditions = mock_symptom_data.get(animal_type.lower(), {}).get(
-        symptoms.lower(), "Unknown symptoms. Further assessment needed."
-    )
-    return f"Animal Type: {animal_type}, Symptoms: {symptoms}, Assessment: {potential_conditions}"
-
-
-TOOLS = {
-    "get_breed_info": get_breed_info,
-    "check_symptoms": check_symptoms,
-}
-
-
-def tools_manifest(tools: dict) -> list[str]:
+def tools_manifest(tools: ToolRegistry) -> list[str]:
     """Generates a list of tool manifests, each containing the tool name and its description.
 
     Args:
-        tools: A dictionary where keys are tool names and values are tool descriptions.
+        tools: The registry of tools to describe.
 
     Returns:
         A list of strings, each representing a tool manifest in the format 'Tool Name: Tool Description'.
+        The registry builds it once and caches it.
     """
-    return [
-        f"{tool_name}: {tool_description.__doc__}"
-        for tool_name, tool_description in tools.items()
-    ]
+    return tools.manifest()
 
 
 def run_agent(question: str) -> str:
@@ -261,10 +367,11 @@ def run_agent(question: str) -> str:
         {"role": "assistant", "content": agent_response.message.content},
     ]
 
-    final_response: ChatResponse = chat(
-        model=os.getenv("OLLAMA_MODEL"),
+    final_response: ollama.ChatResponse = OLLAMA.chat(
+        model=MODEL,
         messages=messages,
-        options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
+        options={"temperature": 0.7, "num_ctx": NUM_CTX, "seed": 42},
+        keep_alive=KEEP_ALIVE,
     )
 
     return final_response.message.content
@@ -298,20 +405,35 @@ def main():
     print("└" + "─" * (terminal_width - 2) + "┘")
     print()
 
+    # The ReAct prompt also carries the tools manifest and scratchpad, so history gets 1k tokens
+    memory = ConversationMemory(
+        max_tokens=1024,
+        summarize=make_llm_summarizer(MODEL, KEEP_ALIVE),
+    )
+
+    if warmup_enabled():
+        print_warmup_report(warm_up([MODEL], KEEP_ALIVE, OLLAMA))
+        print()
+
     while True:
         try:
             user_input = input("You: ").strip()
 
             if user_input.lower() in ("exit", "quit"):
+                viewer = find_exporter(TRACER, InMemoryExporter)
+                if viewer is not None:
+                    print(f"Traces:\n{viewer.render()}")
                 print("Goodbye! Take care of your furry friends!")
                 break
 
             if not user_input:
                 continue
 
-            print(
-                f"Agent: {execute_react_agent(user_input, tools_manifest(TOOLS), TOOLS)}"
+            answer = execute_react_agent(
+                user_input, tools_manifest(TOOLS), TOOLS, memory.transcript()
             )
+            memory.add_turn(user_input, answer)
+            print(f"Agent: {answer}")
 
         except KeyboardInterrupt:
             print("\n👋 Interrupted by user. Goodbye!")
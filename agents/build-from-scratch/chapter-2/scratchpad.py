@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from common.memory import count_tokens, truncate_to_tokens
+
+
+@dataclass
+class ScratchpadStep:
+    content: str
+    action: str | None = None
+    action_input: str | None = None
+    observation: str | None = None
+    compact: bool = False
+
+    def text(self) -> str:
+        """The model's side of the step."""
+        if self.compact and self.action:
+            return f"Action: {self.action}\nAction Input: {self.action_input}"
+        return self.content
+
+    def follow_up(self, compact_observation_tokens: int) -> str:
+        """What the user side adds after the step."""
+        if self.observation is None:
+            return "Thought:"
+        observation = self.observation
+        if self.compact:
+            observation = truncate_to_tokens(observation, compact_observation_tokens)
+        return f"Observation: {observation}\nThought:"
+
+
+class Scratchpad:
+    """Holds the ReAct steps of one run within a token budget.
+
+    Prompt size would otherwise grow with every step and be re-sent each iteration, adding up
+    quadratically. The latest `keep_recent` steps stay verbatim; when the budget is exceeded,
+    older steps are collapsed into compact Action/Action Input/Observation records (their
+    Thoughts dropped, their Observations shortened), and the oldest records are dropped last.
+    Every Observation is also capped at `max_observation_tokens` when it is added.
+
+    Until the budget is reached, steps are only ever appended, so the rendered scratchpad
+    keeps a stable prefix that the model server can keep cached. A compaction rewrites
+    earlier steps (and the "(N earlier steps omitted)" note ahead of them), which costs one
+    full prompt evaluation; to make that rare, it shrinks the steps to `compact_to` of the
+    budget rather than just under it, leaving room for the next steps to be appended again.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        keep_recent: int = 2,
+        max_observation_tokens: int = 256,
+        compact_observation_tokens: int = 48,
+        compact_to: float = 0.75,
+    ):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.max_observation_tokens = max_observation_tokens
+        self.compact_observation_tokens = compact_observation_tokens
+        self.compact_to = compact_to
+        self.steps: list[ScratchpadStep] = []
+        self.dropped = 0
+
+    @classmethod
+    def for_context(
+        cls, num_ctx: int, prompt_tokens: int, reserved_tokens: int = 512
+    ) -> "Scratchpad":
+        """Sizes the scratchpad to what is left of the model's context window once the
+        prompt itself and room for the next step are taken."""
+        return cls(max(256, num_ctx - prompt_tokens - reserved_tokens))
+
+    def add(
+        self,
+        content: str,
+        action: str | None = None,
+        action_input: str | None = None,
+        observation: str | None = None,
+    ) -> None:
+        if observation is not None:
+            observation = truncate_to_tokens(
+                str(observation), self.max_observation_tokens
+            )
+        self.steps.append(ScratchpadStep(content, action, action_input, observation))
+        self._compact()
+
+    def render(self) -> str:
+        """The scratchpad as text, to follow the template's final `Thought:`."""
+        text = ""
+        if self.dropped:
+            text += f" ({self.dropped} earlier steps omitted)\nThought:"
+        for step in self.steps:
+            text += f" {step.text()}\n{step.follow_up(self.compact_observation_tokens)}"
+        return text
+
+    def messages(self) -> list[dict]:
+        """The scratchpad as chat messages, to follow the rendered template."""
+        messages = []
+        if self.dropped:
+            messages.append(
+                {"role": "user", "content": f"({self.dropped} earlier steps omitted)"}
+            )
+        for step in self.steps:
+            messages.append({"role": "assistant", "content": step.text()})
+            messages.append(
+                {
+                    "role": "user",
+                    "content": step.follow_up(self.compact_observation_tokens),
+                }
+            )
+        return messages
+
+    def token_count(self) -> int:
+        return count_tokens(self.render())
+
+    def _compact(self) -> None:
+        if self.token_count() <= self.max_tokens:
+            return
+        target = int(self.max_tokens * self.compact_to)
+        older = len(self.steps) - self.keep_recent
+
+        # First collapse older steps, oldest first
+        for step in self.steps[: max(0, older)]:
+            if self.token_count() <= target:
+                return
+            step.compact = True
+
+        # Then drop the oldest records altogether
+        while self.token_count() > target and len(self.steps) > self.keep_recent:
+            self.steps.pop(0)
+            self.dropped += 1
+
+        # The recent steps alone are too big: shorten their observations
+        for step in self.steps:
+            if self.token_count() <= self.max_tokens:
+                return
+            if step.observation and count_tokens(step.observation) > 64:
+                step.observation = truncate_to_tokens(step.observation, 64)
@@ -1,114 +1,64 @@
+from __future__ import annotations
+
 import os
+import sys
 import json
+import time
 import shutil
-from ollama import chat
-from ollama import ChatResponse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from pathlib import Path
+from typing import Iterator
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.lazy import lazy_import
+from common.memory import ConversationMemory, count_tokens, make_llm_summarizer
+from common.ollama_pool import get_ollama_pool
+from common.tool_memo import TTLCache, ToolMemo
+from common.tool_registry import ToolRegistry
+from common.tracing import (
+    InMemoryExporter,
+    find_exporter,
+    propagate,
+    tracer_from_env,
+)
+from common.warmup import (
+    keep_alive_policy,
+    print_warmup_report,
+    warm_up,
+    warmup_enabled,
+)
+from common.vet_tools import check_symptoms, get_breed_info, search_vet_knowledge
+
+ollama = lazy_import("ollama")
+
 load_dotenv(dotenv_path=".env.local")
 
 LOG_ACTIVITY = os.getenv("LOG_ACTIVITY", "false").lower() == "true"
-
-
-def get_breed_info(breed: str, animal_type: str) -> str:
-    """Retrieves breed-specific health information, common conditions, and care requirements.
-
-    Args:
-        breed: The breed of the animal for which information is requested.
-        animal_type: The type of animal (e.g., 'dog', 'cat').
-
-    Returns:
-        A string containing health information, common conditions, and care requirements for the specified breed.
-        If the breed or animal type is not found, returns a default message with the breed and animal type.
-    """
-    mock_data = {
-        "dog": {
-            "labrador": "Labradors are prone to hip dysplasia and obesity. Regular exercise and a balanced diet are essential.",
-            "poodle": "Poodles often face eye disorders and skin allergies. Regular grooming and vet check-ups are recommended.",
-        },
-        "cat": {
-            "siamese": "Siamese cats can have respiratory issues and dental problems. Regular dental care and a smoke-free environment are beneficial.",
-            "maine coon": "Maine Coons are susceptible to heart disease and hip dysplasia. Regular vet visits and a healthy diet are important.",
-        },
-    }
-
-    return mock_data.get(animal_type.lower(), {}).get(
-        breed.lower(), f"Breed: {breed}, Animal Type: {animal_type}"
-    )
-
-
-def check_symptoms(animal_type: str, symptoms: str) -> str:
-    """Analyzes symptoms and provides an initial assessment for animals.
-
-    Args:
-        animal_type: The type of animal (e.g., 'dog', 'cat').
-        symptoms: A description of the symptoms observed in the animal.
-
-    Returns:
-        A string containing an assessment of the symptoms, including potential conditions and urgency.
-        If the symptoms or animal type are not recognized, returns a message indicating that further assessment is needed.
-    """
-    mock_symptom_data = {
-        "dog": {
-            "coughing": "Coughing in dogs can indicate kennel cough or heart disease. Urgency: Moderate.",
-            "vomiting": "Vomiting may be due to dietary indiscretion or gastrointestinal issues. Urgency: High if persistent.",
-        },
-        "cat": {
-            "sneezing": "Sneezing in cats can be a sign of upper respiratory infection. Urgency: Moderate.",
-            "lethargy": "Lethargy might indicate anemia or infection. Urgency: High if accompanied by other symptoms.",
-        },
-    }
-
-    potential_conditions = mock_symptom_data.get(animal_type.lower(), {}).get(
-        symptoms, "Unknown symptoms. Further assessment needed."
-    )
-    return f"Animal Type: {animal_type}, Symptoms: {symptoms}, Assessment: {potential_conditions}"
-
-
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_breed_info",
-            "description": "Get the breed information for a given animal type and breed.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "animal_type": {
-                        "type": "string",
-                        "description": "The type of animal (e.g., dog, cat)",
-                    },
-                    "breed": {
-                        "type": "string",
-                        "description": "The breed of the animal",
-                    },
-                },
-                "required": ["animal_type", "breed"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "check_symptoms",
-            "description": "Check the symptoms of an animal.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "animal_type": {
-                        "type": "string",
-                        "description": "The type of animal (e.g., 'dog', 'cat')",
-                    },
-                    "symptoms": {
-                        "type": "string",
-                        "description": "The symptoms of the animal",
-                    },
-                },
-                "required": ["animal_type", "symptoms"],
-            },
-        },
-    },
-]
+OLLAMA = get_ollama_pool()
+MODEL = os.getenv("OLLAMA_TOOL_CALLING_MODEL")
+KEEP_ALIVE = keep_alive_policy()
+TRACER = tracer_from_env(console=LOG_ACTIVITY)
+TOOL_RESULT_CACHE = TTLCache(ttl=float(os.getenv("TOOL_CACHE_TTL", "300")))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+
+# Budgets for one answer: tool rounds, LLM tokens (prompt + completion) and seconds
+MAX_TOOL_ROUNDS = int(os.getenv("TOOL_MAX_ROUNDS", "4"))
+AGENT_TOKEN_BUDGET = int(os.getenv("AGENT_TOKEN_BUDGET", "16000"))
+AGENT_TIME_BUDGET = float(os.getenv("AGENT_TIME_BUDGET", "60"))
+
+# All tool calls of one model turn run concurrently on these threads
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool-call")
+
+
+# The JSON schemas sent to the model are generated once from the functions' signatures and docstrings
+TOOL_REGISTRY = ToolRegistry()
+TOOL_REGISTRY.register(get_breed_info, pure=True)
+TOOL_REGISTRY.register(check_symptoms, pure=True)
+# Not pure: the passage store takes appends at any time, so its searches aren't cached
+TOOL_REGISTRY.register(search_vet_knowledge)
+TOOLS = TOOL_REGISTRY.schemas()
 
 SYSTEM_PROMPT = """
 You are a helpful veterinary assistant who's goal is to answer questions about animals and their health. 
@@ -118,77 +68,177 @@ Always respond in a helpful and friendly manner. You do not need to mention abou
 """
 
 
-def call_tool(func_name: str, args: dict) -> str:
+def call_tool(func_name: str, args: dict, memo: ToolMemo | None = None) -> str:
+    memo = memo or ToolMemo(TOOL_REGISTRY, TOOL_RESULT_CACHE, TRACER)
+    return memo.call(func_name, args)
 
-    if LOG_ACTIVITY:
-        print("-" * 100)
-        print(f"Tool: {func_name}")
-        print(f"Arguments: {args}")
-        print("-" * 100)
 
-    if func_name == "get_breed_info":
-        return get_breed_info(args["breed"], args["animal_type"])
-    elif func_name == "check_symptoms":
-        return check_symptoms(args["animal_type"], args["symptoms"])
-
-
-def call_llm(question: str) -> str:
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": question},
+def run_tool_calls(tool_calls: list, memo: ToolMemo) -> list[str]:
+    """Runs all the tool calls the model asked for at once and returns their results in
+    call order. A tool that outlives its timeout (the registry's, else TOOL_TIMEOUT) is
+    reported as an error; its thread is left to finish in the background."""
+    started = time.monotonic()
+    futures = [
+        TOOL_EXECUTOR.submit(
+            propagate(call_tool),
+            tool_call.function.name,
+            tool_call.function.arguments,
+            memo,
+        )
+        for tool_call in tool_calls
     ]
 
-    response: ChatResponse = chat(
-        model=os.getenv("OLLAMA_TOOL_CALLING_MODEL"),
-        messages=messages,
-        options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
-        tools=TOOLS,
-    )
+    results = []
+    for tool_call, future in zip(tool_calls, futures):
+        name = tool_call.function.name
+        timeout = TOOL_TIMEOUT
+        if name in TOOL_REGISTRY and TOOL_REGISTRY[name].timeout is not None:
+            timeout = TOOL_REGISTRY[name].timeout
+        try:
+            # The calls started together, so each deadline counts from the start
+            remaining = max(0.0, started + timeout - time.monotonic())
+            results.append(str(future.result(timeout=remaining)))
+        except TimeoutError:
+            future.cancel()
+            results.append(f"Error: {name} did not finish within {timeout:g}s")
+        except Exception as e:
+            results.append(f"Error: {name} failed: {e}")
+    return results
 
-    try:
-        # Check if tool call was made
-        tool_calls = response["message"]["tool_calls"]
 
-        if LOG_ACTIVITY:
-            print("-" * 100)
-            print(f"Tool Calls: {tool_calls}")
-            print("-" * 100)
+def _chat(stream: bool = False, **kwargs) -> Iterator[ollama.ChatResponse]:
+    """`chat`, recorded as an `llm.call` span with its token counts and payload sizes.
 
-        if tool_calls:
-            for tool_call in tool_calls:
-                func_name = tool_call["function"]["name"]
-                args = tool_call["function"]["arguments"]
+    Yields the streamed chunks, or the whole response as a single chunk when not streaming.
+    """
+    with TRACER.span(
+        "llm.call",
+        model=kwargs["model"],
+        messages=len(kwargs["messages"]),
+        tools=len(kwargs.get("tools") or []),
+        stream=stream,
+    ) as span:
+        if span.recording:
+            span.set(
+                prompt_chars=sum(
+                    len(message.get("content") or "") for message in kwargs["messages"]
+                )
+            )
+        started = time.perf_counter()
+        chunks = (
+            OLLAMA.chat(stream=True, **kwargs) if stream else [OLLAMA.chat(**kwargs)]
+        )
+        completion_chars = 0
+        for chunk in chunks:
+            if chunk.message.content and not completion_chars:
+                span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 1))
+            completion_chars += len(chunk.message.content or "")
+            if chunk.done:
+                span.set(
+                    prompt_eval_count=chunk.prompt_eval_count,
+                    eval_count=chunk.eval_count,
+                    completion_chars=completion_chars,
+                )
+            yield chunk
+
+
+def call_llm(question: str, memory: ConversationMemory | None = None) -> str:
+    with TRACER.span("agent.run", agent="tool_calling") as run:
+        return "".join(_tool_rounds(question, memory, run, stream=False))
+
+
+def stream_llm(
+    question: str, memory: ConversationMemory | None = None
+) -> Iterator[str]:
+    """Like `call_llm`, and with the same answer, but yields its text as it is generated.
+
+    A round's text streams live until the model asks for a tool; whatever it writes after
+    that in the same round follows once the round ends.
+    """
+    with TRACER.span("agent.run", agent="tool_calling", stream=True) as run:
+        yield from _tool_rounds(question, memory, run, stream=True)
 
-            result = call_tool(func_name, args)
 
-            if LOG_ACTIVITY:
-                print("-" * 100)
-                print(f"Result: {result}")
-                print("-" * 100)
+def _tool_rounds(
+    question: str, memory: ConversationMemory | None, run, stream: bool
+) -> Iterator[str]:
+    """Calls tools for as many rounds as the model needs, within the round, token and time
+    budgets, and yields the text of every round up to the first one without tool calls:
+    the answer, after any words the model said before calling its tools.
 
-            # Feed tool output back
-            messages.append(
-                {"role": "assistant", "tool_called": func_name, "content": None}
-            )
+    A question that needs no tool is answered by the very first call. Once a budget is
+    spent, the tools are withheld so the model has to answer with what it has gathered.
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(memory.messages() if memory else []),
+        {"role": "user", "content": question},
+    ]
+    memo = ToolMemo(TOOL_REGISTRY, TOOL_RESULT_CACHE, TRACER)
+    deadline = time.monotonic() + AGENT_TIME_BUDGET
+    used_tokens = 0
+
+    for iteration in range(MAX_TOOL_ROUNDS + 1):
+        exhausted = (
+            iteration == MAX_TOOL_ROUNDS
+            or used_tokens >= AGENT_TOKEN_BUDGET
+            or time.monotonic() >= deadline
+        )
+        with TRACER.span("agent.iteration", iteration=iteration) as span:
+            content = []
+            tool_calls = []
+            streamed = 0
+            for chunk in _chat(
+                stream=stream,
+                model=MODEL,
+                messages=messages,
+                options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
+                keep_alive=KEEP_ALIVE,
+                tools=None if exhausted else TOOLS,
+            ):
+                tool_calls.extend(chunk.message.tool_calls or [])
+                if chunk.message.content:
+                    content.append(chunk.message.content)
+                    # Until a tool call shows up, this may well be the answer
+                    if stream and not tool_calls:
+                        streamed += 1
+                        yield chunk.message.content
+                if chunk.done:
+                    used_tokens += (chunk.prompt_eval_count or 0) + (
+                        chunk.eval_count or 0
+                    )
+
+            if stream:
+                yield from content[streamed:]
+            else:
+                yield "".join(content)
+
+            if exhausted or not tool_calls:
+                run.set(
+                    iterations=iteration + 1,
+                    tokens=used_tokens,
+                    outcome="budget" if exhausted else "answer",
+                )
+                return
+
+            span.set(tool_calls=len(tool_calls))
+            results = run_tool_calls(tool_calls, memo)
+
+            # Feed tool output back: the model's turn with its calls, then one result per
+            # call, in the same order (clients that know `tool_name` also send the name)
             messages.append(
-                {"role": "tool", "tool_called": func_name, "content": result}
+                ollama.Message(
+                    role="assistant", content="".join(content), tool_calls=tool_calls
+                )
             )
-
-        if LOG_ACTIVITY:
-            print("-" * 100)
-            print(f"Messages: {messages}")
-            print("-" * 100)
-
-        final: ChatResponse = chat(
-            model=os.getenv("OLLAMA_TOOL_CALLING_MODEL"),
-            messages=messages,
-            options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
-        )
-
-        return final.message.content
-
-    except Exception as e:
-        return response.message.content
+            for tool_call, result in zip(tool_calls, results):
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_name": tool_call.function.name,
+                        "content": result,
+                    }
+                )
 
 
 def main():
@@ -212,18 +262,40 @@ def main():
     print("└" + "─" * (terminal_width - 2) + "┘")
     print()
 
+    # Leave room in num_ctx for the system prompt, tool schemas, tool results and the answer
+    memory = ConversationMemory.for_context(
+        num_ctx=4096,
+        reserved_tokens=count_tokens(SYSTEM_PROMPT)
+        + count_tokens(json.dumps(TOOLS))
+        + 1024,
+        summarize=make_llm_summarizer(MODEL, KEEP_ALIVE),
+    )
+
+    if warmup_enabled():
+        print_warmup_report(warm_up([MODEL], KEEP_ALIVE, OLLAMA))
+        print()
+
     while True:
         try:
             user_input = input("You: ").strip()
 
             if user_input.lower() in ("exit", "quit"):
+                viewer = find_exporter(TRACER, InMemoryExporter)
+                if viewer is not None:
+                    print(f"Traces:\n{viewer.render()}")
                 print("Goodbye! Take care of your furry friends!")
                 break
 
             if not user_input:
                 continue
 
-            print(call_llm(user_input))
+            # Print the answer as it is generated rather than once it is complete
+            answer = ""
+            for text in stream_llm(user_input, memory):
+                print(text, end="", flush=True)
+                answer += text
+            print()
+            memory.add_turn(user_input, answer)
 
         except KeyboardInterrupt:
             print("\n👋 Interrupted by user. Goodbye!")
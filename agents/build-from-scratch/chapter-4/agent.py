@@ -1,109 +1,255 @@
 import os
+import sys
+import time
 import shutil
-from smolagents import ToolCallingAgent, LiteLLMModel, tool
-from ollama import chat
-from ollama import ChatResponse
+from functools import cache
+from pathlib import Path
+from typing import Iterator
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.agent_pool import AgentPool
+from common.lazy import lazy_import
+from common.ollama_pool import get_ollama_pool
+from common.tool_registry import ToolRegistry
+from common.tracing import InMemoryExporter, find_exporter, tracer_from_env
+from common.warmup import (
+    keep_alive_policy,
+    print_warmup_report,
+    warm_up,
+    warmup_enabled,
+)
+from common.vet_tools import check_symptoms, get_breed_info, search_vet_knowledge
+
+ollama = lazy_import("ollama")
+
 load_dotenv(dotenv_path=".env.local")
 
+LOG_ACTIVITY = os.getenv("LOG_ACTIVITY", "false").lower() == "true"
+OLLAMA = get_ollama_pool()
+MODEL = os.getenv("OLLAMA_MODEL")
+KEEP_ALIVE = keep_alive_policy()
+TRACER = tracer_from_env(console=LOG_ACTIVITY)
+# Re-phrase the agent's answer with a second, plain chat call (the original two-pass flow);
+# only then does the answer stream.
+# On `benchmarks.agents`' four scripted questions (default latencies), the single pass
+# takes 7 LLM round-trips, 11.9k prompt and 228 completion tokens and 553 ms, against 11,
+# 12.4k, 267 and 677 ms with re-phrasing: one call fewer and ~18% faster per question
+REPHRASE = os.getenv("AGENT_REPHRASE", "false").lower() == "true"
 
-@tool
-def get_breed_info(breed: str, animal_type: str) -> str:
-    """Retrieves breed-specific health information, common conditions, and care requirements.
 
-    Args:
-        breed: The breed of the animal for which information is requested.
-        animal_type: The type of animal (e.g., 'dog', 'cat').
+TOOL_REGISTRY = ToolRegistry([get_breed_info, check_symptoms, search_vet_knowledge])
 
-    Returns:
-        A string containing health information, common conditions, and care requirements for the specified breed.
-        If the breed or animal type is not found, returns a default message with the breed and animal type.
-    """
-    mock_data = {
-        "dog": {
-            "labrador": "Labradors are prone to hip dysplasia and obesity. Regular exercise and a balanced diet are essential.",
-            "poodle": "Poodles often face eye disorders and skin allergies. Regular grooming and vet check-ups are recommended.",
-        },
-        "cat": {
-            "siamese": "Siamese cats can have respiratory issues and dental problems. Regular dental care and a smoke-free environment are beneficial.",
-            "maine coon": "Maine Coons are susceptible to heart disease and hip dysplasia. Regular vet visits and a healthy diet are important.",
-        },
-    }
+###########################################################################################################
+#                                           AGENT                                                         #
+###########################################################################################################
 
-    return mock_data.get(animal_type.lower(), {}).get(
-        breed.lower(), f"Breed: {breed}, Animal Type: {animal_type}"
-    )
+SYSTEM_PROMPT = """
+You are a helpful veterinary assistant who's goal is to answer questions about animals and their health. 
+Only answer if you know the answer. If you don't know the answer, say 'I don't know'.
+You are to only answer questions about animals and their health.
+Always respond in a helpful and friendly manner. You do not need to mention about yourself.
+"""
 
+# The persona and style rules ride along in the agent's own system prompt, so the answer it
+# passes to final_answer is already the one to show the user
+AGENT_INSTRUCTIONS = (
+    SYSTEM_PROMPT
+    + """When you give your final answer, write it for the pet owner who asked: in plain, warm
+language, using what the tools returned, without mentioning the tools themselves.
+"""
+)
 
-@tool
-def check_symptoms(animal_type: str, symptoms: str) -> str:
-    """Analyzes symptoms and provides an initial assessment for animals.
 
-    Args:
-        animal_type: The type of animal (e.g., 'dog', 'cat').
-        symptoms: A description of the symptoms observed in the animal.
+# smolagents and litellm take seconds to import and set up, so the model and the agent are
+# built on first use rather than when this module is imported
+@cache
+def get_model():
+    """The agent's LiteLLM model, on the same Ollama hosts, timeouts and retries as OLLAMA.
 
-    Returns:
-        A string containing an assessment of the symptoms, including potential conditions and urgency.
-        If the symptoms or animal type are not recognized, returns a message indicating that further assessment is needed.
+    With several hosts, a LiteLLM router sends each step to the least busy one and retries
+    failed calls on the others.
     """
-    mock_symptom_data = {
-        "dog": {
-            "coughing": "Coughing in dogs can indicate kennel cough or heart disease. Urgency: Moderate.",
-            "vomiting": "Vomiting may be due to dietary indiscretion or gastrointestinal issues. Urgency: High if persistent.",
-        },
-        "cat": {
-            "sneezing": "Sneezing in cats can be a sign of upper respiratory infection. Urgency: Moderate.",
-            "lethargy": "Lethargy might indicate anemia or infection. Urgency: High if accompanied by other symptoms.",
-        },
-    }
+    from smolagents import LiteLLMModel, LiteLLMRouterModel
+
+    if not MODEL:
+        raise ValueError("OLLAMA_MODEL is not set; add it to .env.local")
+    model_id = "ollama_chat/" + MODEL
+    if len(OLLAMA.hosts) == 1:
+        return LiteLLMModel(
+            model_id=model_id,
+            api_base=OLLAMA.hosts[0].url,
+            timeout=OLLAMA.timeout,
+            num_retries=OLLAMA.retries,
+            temperature=0.7,
+        )
 
-    potential_conditions = mock_symptom_data.get(animal_type.lower(), {}).get(
-        symptoms, "Unknown symptoms. Further assessment needed."
+    class RouterModel(LiteLLMRouterModel):
+        # smolagents passes api_base=None on every call, which would override the
+        # api_base of the deployment the router picked
+        def _prepare_completion_kwargs(self, *args, **kwargs) -> dict:
+            completion_kwargs = super()._prepare_completion_kwargs(*args, **kwargs)
+            if completion_kwargs.get("api_base") is None:
+                completion_kwargs.pop("api_base", None)
+            return completion_kwargs
+
+    return RouterModel(
+        model_id=model_id,
+        model_list=[
+            {
+                "model_name": model_id,
+                "litellm_params": {"model": model_id, "api_base": host.url},
+            }
+            for host in OLLAMA.hosts
+        ],
+        client_kwargs={
+            "routing_strategy": "least-busy",
+            "num_retries": OLLAMA.retries,
+            "timeout": OLLAMA.timeout,
+            "allowed_fails": 1,
+            "cooldown_time": OLLAMA.cooldown,
+        },
+        temperature=0.7,
     )
-    return f"Animal Type: {animal_type}, Symptoms: {symptoms}, Assessment: {potential_conditions}"
 
 
-###########################################################################################################
-#                                           AGENT                                                         #
-###########################################################################################################
+@cache
+def get_tools() -> list:
+    from smolagents import tool
 
-model_id = "ollama_chat/" + os.getenv("OLLAMA_MODEL")
+    return [tool(spec.func) for spec in TOOL_REGISTRY.specs()]
 
-model = LiteLLMModel(model_id=model_id, temperature=0.7)
 
-SYSTEM_PROMPT = """
-You are a helpful veterinary assistant who's goal is to answer questions about animals and their health. 
-Only answer if you know the answer. If you don't know the answer, say 'I don't know'.
-You are to only answer questions about animals and their health.
-Always respond in a helpful and friendly manner. You do not need to mention about yourself.
-"""
+def new_agent():
+    """A fresh agent; the model and tools are shared, only the memory is its own."""
+    from smolagents import ToolCallingAgent
+
+    return ToolCallingAgent(
+        model=get_model(),
+        tools=get_tools(),
+        add_base_tools=False,
+        instructions=AGENT_INSTRUCTIONS,
+    )
+
+
+def _reset_agent(agent) -> None:
+    agent.memory.reset()
+    agent.monitor.reset()
 
-agent = ToolCallingAgent(
-    model=model,
-    tools=[get_breed_info, check_symptoms],
-    add_base_tools=False,
-)
 
+# An agent's memory holds the run in progress, so each session gets an agent of its own
+AGENT_POOL = AgentPool(
+    new_agent,
+    reset=_reset_agent,
+    max_size=int(os.getenv("AGENT_POOL_SIZE", "4")),
+    idle_timeout=float(os.getenv("AGENT_POOL_IDLE_TIMEOUT", "600")),
+    wait_timeout=float(os.getenv("AGENT_POOL_WAIT_TIMEOUT", "30")),
+)
 
-def call_agent(user_input: str) -> str:
 
-    response = agent.run(user_input)
+def _run_agent(user_input: str, session_id: str | None = None) -> str:
+    """Runs a pooled agent and returns its final answer.
 
-    messages = [
+    Within a session the agent keeps its memory from one question to the next; without a
+    session id every question starts from a clean memory.
+    """
+    with AGENT_POOL.checkout(session_id) as lease:
+        agent = lease.agent
+        with TRACER.span("agent.steps", session=session_id, turn=lease.turns) as span:
+            response = agent.run(user_input, reset=lease.turns == 0)
+            # smolagents keeps its own step log and token counts
+            span.set(
+                steps=len(agent.memory.steps),
+                **agent.monitor.get_total_token_counts().dict(),
+            )
+    return str(response)
+
+
+def _rephrase_messages(user_input: str, answer: str) -> list[dict]:
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "tool", "content": response},
+        {"role": "tool", "content": answer},
         {"role": "user", "content": user_input},
     ]
 
-    final: ChatResponse = chat(
-        model=os.getenv("OLLAMA_MODEL"),
-        messages=messages,
-        options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
-    )
 
-    return final.message.content
+def call_agent(
+    user_input: str, rephrase: bool | None = None, session_id: str | None = None
+) -> str:
+    """Answers with a single agent run, plus a re-phrasing chat call when `rephrase` (by
+    default AGENT_REPHRASE) is set. Questions sharing a `session_id` share the agent's
+    memory."""
+    rephrase = REPHRASE if rephrase is None else rephrase
+    with TRACER.span("agent.run", agent="smolagents", rephrase=rephrase):
+        answer = _run_agent(user_input, session_id)
+        if not rephrase:
+            return answer
+        messages = _rephrase_messages(user_input, answer)
+
+        with TRACER.span("llm.call", model=MODEL, messages=len(messages)) as span:
+            final: ollama.ChatResponse = OLLAMA.chat(
+                model=MODEL,
+                messages=messages,
+                options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
+                keep_alive=KEEP_ALIVE,
+            )
+            span.set(
+                prompt_eval_count=final.prompt_eval_count,
+                eval_count=final.eval_count,
+                completion_chars=len(final.message.content or ""),
+            )
+
+        return final.message.content
+
+
+def stream_agent(
+    user_input: str, rephrase: bool | None = None, session_id: str | None = None
+) -> Iterator[str]:
+    """Like `call_agent`, but yields the re-phrased answer's text as it is generated.
+
+    Only re-phrasing streams. In the default single pass the answer is yielded whole once
+    the agent is done: it is the argument of the agent's final_answer tool call, and Ollama
+    sends a tool call's arguments in one piece rather than as they are generated. Set
+    AGENT_REPHRASE=true (or pass `rephrase=True`) for a streamed answer, at the cost of
+    one more LLM call.
+    """
+    rephrase = REPHRASE if rephrase is None else rephrase
+    with TRACER.span("agent.run", agent="smolagents", rephrase=rephrase, stream=True):
+        answer = _run_agent(user_input, session_id)
+        if not rephrase:
+            yield answer
+            return
+        messages = _rephrase_messages(user_input, answer)
+
+        with TRACER.span(
+            "llm.call",
+            model=MODEL,
+            messages=len(messages),
+            stream=True,
+        ) as span:
+            started = time.perf_counter()
+            stream = OLLAMA.chat(
+                model=MODEL,
+                messages=messages,
+                options={"temperature": 0.7, "num_ctx": 4096, "seed": 42},
+                keep_alive=KEEP_ALIVE,
+                stream=True,
+            )
+            first_token = True
+            for chunk in stream:
+                if chunk.message.content:
+                    if first_token:
+                        first_token = False
+                        span.set(
+                            ttft_ms=round((time.perf_counter() - started) * 1000, 1)
+                        )
+                    yield chunk.message.content
+                if chunk.done:
+                    span.set(
+                        prompt_eval_count=chunk.prompt_eval_count,
+                        eval_count=chunk.eval_count,
+                    )
 
 
 def main():
@@ -127,18 +273,28 @@ def main():
     print("└" + "─" * (terminal_width - 2) + "┘")
     print()
 
+    if warmup_enabled():
+        print_warmup_report(warm_up([MODEL], KEEP_ALIVE, OLLAMA))
+        print()
+
     while True:
         try:
             user_input = input("You: ").strip()
 
             if user_input.lower() in ("exit", "quit"):
+                viewer = find_exporter(TRACER, InMemoryExporter)
+                if viewer is not None:
+                    print(f"Traces:\n{viewer.render()}")
                 print("Goodbye! Take care of your furry friends!")
                 break
 
             if not user_input:
                 continue
 
-            print(call_agent(user_input))
+            # Printed as it is generated when re-phrasing; otherwise whole (see stream_agent)
+            for text in stream_agent(user_input, session_id="repl"):
+                print(text, end="", flush=True)
+            print()
 
         except KeyboardInterrupt:
             print("\n👋 Interrupted by user. Goodbye!")
@@ -0,0 +1,197 @@
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when no agent frees up within the pool's wait timeout."""
+
+
+@dataclass
+class Lease(Generic[T]):
+    """An agent checked out for one run.
+
+    `turns` counts the runs this session already made on the agent: 0 means the agent's
+    memory holds nothing of this session, so the run must start from a clean slate.
+    """
+
+    agent: T
+    session_id: str | None
+    turns: int
+
+
+@dataclass
+class _Slot(Generic[T]):
+    agent: T
+    session_id: str | None = None
+    turns: int = 0
+    busy: bool = False
+    last_used: float = field(default_factory=time.monotonic)
+    end_on_release: bool = False
+
+
+class AgentPool(Generic[T]):
+    """Reusable agents, checked out per session so concurrent users never share memory.
+
+    A session keeps the agent it was given between turns, so its conversation carries on
+    where it stopped, and only one run per session happens at a time. Sessions idle for
+    `idle_timeout` seconds give their agent back: its memory is reset and it serves the next
+    new session; an agent left unused for another `idle_timeout` is dropped. When all
+    `max_size` agents are taken, a new session takes over the least recently used idle one,
+    or waits up to `wait_timeout` seconds for one to be released.
+
+    Args:
+        factory: Builds a new agent; only called while the pool is below `max_size`.
+        reset: Clears an agent's memory before it moves to another session.
+        max_size: The most agents the pool holds, i.e. the most runs at once.
+        idle_timeout: Seconds of inactivity after which a session is ended.
+        wait_timeout: Seconds a checkout waits for an agent before raising PoolExhausted.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        reset: Callable[[T], None],
+        max_size: int = 4,
+        idle_timeout: float = 600.0,
+        wait_timeout: float = 30.0,
+    ):
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._sessions: dict[str, _Slot[T]] = {}
+        self._free: list[_Slot[T]] = []
+        self._size = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def checkout(self, session_id: str | None = None) -> Iterator[Lease[T]]:
+        """Lends the session's agent for one run. Without a session id the agent is lent
+        for this run only, with a clean memory, and goes back to the pool afterwards."""
+        slot = self._acquire(session_id)
+        try:
+            yield Lease(slot.agent, session_id, slot.turns)
+        finally:
+            self._release(slot)
+
+    def end_session(self, session_id: str) -> None:
+        """Forgets a session; its agent's memory is reset once its current run is over."""
+        with self._condition:
+            slot = self._sessions.get(session_id)
+            if slot is None:
+                return
+            if slot.busy:
+                slot.end_on_release = True
+            else:
+                self._end_locked(slot)
+                self._condition.notify_all()
+
+    def evict_idle(self) -> None:
+        """Ends idle sessions and drops unused agents; checkouts also do this as they go."""
+        with self._condition:
+            self._evict_idle_locked(time.monotonic())
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "agents": self._size,
+                "sessions": len(self._sessions),
+                "idle_sessions": sum(not slot.busy for slot in self._sessions.values()),
+                "free": len(self._free),
+            }
+
+    def _acquire(self, session_id: str | None) -> _Slot[T]:
+        deadline = time.monotonic() + self.wait_timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._evict_idle_locked(now)
+
+                slot = self._sessions.get(session_id) if session_id else None
+                if slot is not None:
+                    if not slot.busy:
+                        slot.busy = True
+                        return slot
+                else:
+                    slot = self._take_free_locked()
+                    if slot is None and self._size < self.max_size:
+                        slot = self._create_locked()
+                    if slot is not None:
+                        slot.session_id = session_id
+                        slot.turns = 0
+                        slot.busy = True
+                        if session_id:
+                            self._sessions[session_id] = slot
+                        return slot
+
+                if now >= deadline or not self._condition.wait(deadline - now):
+                    raise PoolExhausted(
+                        f"No agent became available within {self.wait_timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+
+    def _create_locked(self) -> _Slot[T]:
+        # Reserve the place first, then build without holding up other checkouts
+        self._size += 1
+        self._condition.release()
+        try:
+            agent = self.factory()
+        except BaseException:
+            self._condition.acquire()
+            self._size -= 1
+            self._condition.notify_all()
+            raise
+        self._condition.acquire()
+        return _Slot(agent)
+
+    def _take_free_locked(self) -> _Slot[T] | None:
+        if self._free:
+            return self._free.pop()
+        # The pool is full of sessions: take over the least recently used idle one
+        idle = [slot for slot in self._sessions.values() if not slot.busy]
+        if self._size < self.max_size or not idle:
+            return None
+        slot = min(idle, key=lambda slot: slot.last_used)
+        self._end_locked(slot)
+        return self._free.pop()
+
+    def _release(self, slot: _Slot[T]) -> None:
+        with self._condition:
+            slot.busy = False
+            slot.turns += 1
+            slot.last_used = time.monotonic()
+            if slot.session_id is None or slot.end_on_release:
+                self._end_locked(slot)
+            self._condition.notify_all()
+
+    def _end_locked(self, slot: _Slot[T]) -> None:
+        if slot.session_id is not None:
+            self._sessions.pop(slot.session_id, None)
+        self.reset(slot.agent)
+        slot.session_id = None
+        slot.turns = 0
+        slot.end_on_release = False
+        slot.last_used = time.monotonic()
+        self._free.append(slot)
+
+    def _evict_idle_locked(self, now: float) -> None:
+        expired = [
+            slot
+            for slot in self._sessions.values()
+            if not slot.busy and now - slot.last_used > self.idle_timeout
+        ]
+        for slot in expired:
+            self._end_locked(slot)
+
+        unused = [
+            slot for slot in self._free if now - slot.last_used > self.idle_timeout
+        ]
+        for slot in unused:
+            self._free.remove(slot)
+            self._size -= 1
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable
+
+
+async def gather_bounded(
+    factories: Iterable[Callable[[], Awaitable[Any]]],
+    max_concurrency: int = 8,
+    timeout: float | None = None,
+) -> list[Any]:
+    """Runs coroutines concurrently, at most `max_concurrency` at a time.
+
+    Args:
+        factories: Zero-argument callables that each create one coroutine. Coroutines are
+            only created once a slot is free, so queued work holds no resources.
+        max_concurrency: The maximum number of coroutines running at once.
+        timeout: Per-item timeout in seconds, measured from when the item starts running.
+
+    Returns:
+        The results in input order. A failed or timed-out item is returned as its exception
+        instead of cancelling the whole batch.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(factory: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(factory(), timeout)
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(run(factory) for factory in factories))
@@ -0,0 +1,31 @@
+import sys
+import importlib.util
+from functools import cache
+from pathlib import Path
+from types import ModuleType
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHAPTER_SCRIPTS = {
+    "chapter-1": "simple_llm_call.py",
+    "chapter-2": "react_agent.py",
+    "chapter-3": "function_calling_agent.py",
+    "chapter-4": "agent.py",
+}
+
+
+@cache
+def load_chapter(chapter: str) -> ModuleType:
+    """Imports a chapter's script as a module (the folder names aren't valid package names)."""
+    path = ROOT / chapter / CHAPTER_SCRIPTS[chapter]
+
+    # Chapters import their sibling modules directly, as they do when run as scripts
+    if str(path.parent) not in sys.path:
+        sys.path.append(str(path.parent))
+
+    name = chapter.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
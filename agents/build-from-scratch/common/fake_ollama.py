@@ -0,0 +1,314 @@
+"""A tiny local stand-in for the Ollama HTTP API.
+
+It speaks just enough of `/api/chat` (blocking and streamed NDJSON), `/api/generate`
+and `/api/show` for the `ollama` client and LiteLLM to talk to it, with configurable
+latency and scripted replies. Point a chapter at it with `OLLAMA_HOST`:
+
+    python -m common.fake_ollama --port 11435 --latency 0.2
+    OLLAMA_HOST=http://127.0.0.1:11435 uv run chapter-1/simple_llm_call.py
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# What `/api/show` reports for every model. LiteLLM only sends `tools` to a model whose
+# template mentions them, and otherwise falls back to prompting for JSON
+MODEL_INFO = {
+    "template": "{{ if .Tools }}{{ .Tools }}{{ end }}{{ .Prompt }}",
+    "capabilities": ["completion", "tools"],
+    "details": {"format": "gguf", "family": "fake", "parameter_size": "0B"},
+    "model_info": {"general.architecture": "fake", "fake.context_length": 32768},
+}
+
+
+def default_responder(request: dict) -> dict:
+    """Answers with a canned sentence that echoes the last user message."""
+    question = ""
+    for message in reversed(request.get("messages", [])):
+        if message.get("role") == "user":
+            question = message.get("content") or ""
+            break
+    return {"content": f"This is a fake answer to: {question}"}
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), good enough for fake accounting."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class FakeOllama:
+    """Runs a fake Ollama server on a background thread.
+
+    Args:
+        responder: Called with the decoded request body, returns a dict with `content`
+            and optionally `tool_calls`. Defaults to an echoing canned answer.
+        latency: Seconds to wait before the first token.
+        token_latency: Seconds to wait between streamed chunks.
+        prompt_token_latency: Extra seconds to wait per prompt token before the first
+            token, so that longer prompts cost more, as they do with a real model.
+        host: Interface to bind to.
+        port: Port to bind to, 0 picks a free one.
+
+    Set `error_status` (e.g. to 503) to answer every POST with that error instead, like an
+    overloaded or failing server.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[dict], dict] | None = None,
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        prompt_token_latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.error_status: int | None = None
+        self.requests: list[dict] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._server.handle_error = self._handle_error
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _record(self, path: str, body: dict) -> dict:
+        """Keeps the request; `/api/chat` records also get the token counts reported for it."""
+        record = {"path": path, "body": body}
+        with self._lock:
+            self.requests.append(record)
+        return record
+
+    def _handle_error(self, request, client_address) -> None:
+        # Clients dropping a connection (e.g. a closed stream) is routine, not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self._server, request, client_address)
+
+    def _reply(self, body: dict) -> tuple[str, list[dict]]:
+        reply = self.responder(body)
+        content = reply.get("content") or ""
+
+        # Honour stop sequences the way Ollama does: cut before the first match
+        for stop in (body.get("options") or {}).get("stop") or []:
+            index = content.find(stop)
+            if index != -1:
+                content = content[:index]
+
+        return content, reply.get("tool_calls") or []
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                elif self.path in ("/api/tags", "/api/ps"):
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                record = fake._record(self.path, body)
+
+                try:
+                    if fake.error_status is not None:
+                        self._send_json(
+                            {"error": "fake failure"}, status=fake.error_status
+                        )
+                    elif self.path == "/api/chat":
+                        self._chat(body, record)
+                    elif self.path == "/api/generate":
+                        self._generate(body)
+                    elif self.path == "/api/show":
+                        self._send_json(MODEL_INFO)
+                    else:
+                        self._send_json({"error": "not found"}, status=404)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading early, like a real cancelled generation
+                    self.close_connection = True
+
+            def _chat(self, body: dict, record: dict):
+                # Tool definitions are rendered into the prompt as well
+                prompt = json.dumps(body.get("messages", []))
+                if body.get("tools"):
+                    prompt += json.dumps(body["tools"])
+                if not body.get("messages"):
+                    # An empty chat only loads the model
+                    self._send_json(self._final(body, "", prompt, 0, []))
+                    return
+
+                time.sleep(
+                    fake.latency + fake.prompt_token_latency * count_tokens(prompt)
+                )
+                content, tool_calls = fake._reply(body)
+                words = content.split(" ")
+                pieces = [word + " " for word in words[:-1]] + words[-1:]
+                record["prompt_eval_count"] = count_tokens(prompt)
+                record["eval_count"] = len(pieces) + (
+                    count_tokens(json.dumps(tool_calls)) if tool_calls else 0
+                )
+
+                if not body.get("stream", True):
+                    time.sleep(fake.token_latency * len(pieces))
+                    self._send_json(
+                        self._final(
+                            body, content, prompt, record["eval_count"], tool_calls
+                        )
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in pieces:
+                    self._send_chunk(
+                        {
+                            "model": body.get("model"),
+                            "created_at": _now(),
+                            "message": {"role": "assistant", "content": piece},
+                            "done": False,
+                        }
+                    )
+                    time.sleep(fake.token_latency)
+                self._send_chunk(
+                    self._final(body, "", prompt, record["eval_count"], tool_calls)
+                )
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _generate(self, body: dict):
+                if body.get("prompt"):
+                    time.sleep(fake.latency)
+                response = {
+                    "model": body.get("model"),
+                    "created_at": _now(),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load",
+                    "load_duration": 0,
+                }
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    self._send_chunk(response)
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self._send_json(response)
+
+            def _final(self, body, content, prompt, eval_count, tool_calls) -> dict:
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = [
+                        {"function": call} if "function" not in call else call
+                        for call in tool_calls
+                    ]
+                prompt_eval_duration = int(
+                    (fake.latency + fake.prompt_token_latency * count_tokens(prompt))
+                    * 1e9
+                )
+                eval_duration = max(1, int(fake.token_latency * eval_count * 1e9))
+                return {
+                    "model": body.get("model"),
+                    "created_at": _now(),
+                    "message": message,
+                    "done": True,
+                    "done_reason": "stop",
+                    "total_duration": prompt_eval_duration + eval_duration,
+                    "load_duration": 0,
+                    "prompt_eval_count": count_tokens(prompt),
+                    "prompt_eval_duration": prompt_eval_duration,
+                    "eval_count": eval_count,
+                    "eval_duration": eval_duration,
+                }
+
+            def _send_chunk(self, payload: dict):
+                data = json.dumps(payload).encode() + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, payload: dict, status: int = 200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        prompt_token_latency=args.prompt_token_latency,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
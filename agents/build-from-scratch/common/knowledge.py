@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import math
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Generic, TypeVar
+
+DEFAULT_KNOWLEDGE_PATH = Path(__file__).resolve().parent / "data" / "vet_knowledge.json"
+
+# Fuzzy matches below this trigram similarity are treated as no match
+MIN_SIMILARITY = 0.5
+
+NON_WORD = re.compile(r"[^\w\s]+")
+SPACES = re.compile(r"\s+")
+
+T = TypeVar("T")
+
+
+def normalize(text: str) -> str:
+    """Case-folds, drops punctuation and collapses whitespace: 'Maine-Coon ' -> 'maine coon'."""
+    return SPACES.sub(" ", NON_WORD.sub(" ", str(text).casefold())).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Edits (insertions, deletions, substitutions and swaps of adjacent letters) that turn
+    `a` into `b`: the optimal string alignment distance."""
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        before, previous = previous, current
+    return previous[-1]
+
+
+def is_typo_of(word: str, target: str) -> bool:
+    """Whether `word` is `target` give or take a typo or two: one edit in a word of four
+    letters or more, two from eight. 'labradr' is a labrador, 'labradoodle' isn't."""
+    if word == target:
+        return True
+    allowed = 2 if len(target) >= 8 else 1 if len(target) >= 4 else 0
+    return (
+        abs(len(word) - len(target)) <= allowed
+        and edit_distance(word, target) <= allowed
+    )
+
+
+def shares_word(query: str, name: str) -> bool:
+    """Whether a word of the query is, typos aside, a word of the name."""
+    targets = name.split()
+    return any(is_typo_of(word, target) for word in query.split() for target in targets)
+
+
+class TrigramIndex(Generic[T]):
+    """Maps normalized names (and their aliases) to values, exactly or fuzzily.
+
+    Exact lookups are a dictionary access. Fuzzy lookups go through an inverted index of
+    trigrams, count only the query's rarest trigrams and score only the names that can
+    still reach MIN_SIMILARITY, so they stay under a millisecond with tens of thousands of
+    names (see `benchmarks.knowledge`). A fuzzy match must also share a word with the query, up to
+    a typo, so that similar-looking but different names ('labradoodle', 'labrador') don't
+    match.
+    """
+
+    def __init__(self):
+        self._values: dict[str, T] = {}
+        self._names: list[str] = []
+        self._grams: list[int] = []
+        self._longest = 0
+        self._postings: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, name: str, value: T) -> None:
+        name = normalize(name)
+        if not name or name in self._values:
+            return
+        self._values[name] = value
+        grams = trigrams(name)
+        index = len(self._names)
+        self._names.append(name)
+        self._grams.append(len(grams))
+        self._longest = max(self._longest, len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(index)
+
+    def get(self, name: str) -> T | None:
+        return self._values.get(normalize(name))
+
+    def search(self, query: str) -> tuple[T, float] | None:
+        """The value of the best matching name and its similarity (1.0 for an exact match)."""
+        query = normalize(query)
+        if query in self._values:
+            return self._values[query], 1.0
+        if not query:
+            return None
+
+        # A name of n trigrams sharing c with the query's q has a Jaccard similarity of
+        # c / (q + n - c). Reaching MIN_SIMILARITY takes c >= s * q, so a match has one of
+        # the query's `size - skipped` rarest trigrams: only their postings are counted,
+        # which leaves out the long ones of common words ('terrier', 'american')
+        grams = sorted(
+            trigrams(query), key=lambda gram: len(self._postings.get(gram, ()))
+        )
+        size = len(grams)
+        skipped = math.ceil(MIN_SIMILARITY * size) - 1
+        shared = Counter()
+        for gram in grams[: size - skipped]:
+            shared.update(self._postings.get(gram, ()))
+
+        # Keep the names that could still get there with every skipped trigram: one of n
+        # trigrams needs c >= s * (q + n) / (1 + s)
+        minimum = [
+            math.ceil(MIN_SIMILARITY * (size + n) / (1 + MIN_SIMILARITY) - 1e-9)
+            - skipped
+            for n in range(self._longest + 1)
+        ]
+        lengths = self._grams
+        candidates = [
+            index for index, count in shared.items() if count >= minimum[lengths[index]]
+        ]
+
+        # Score them best bound first, looking the skipped trigrams up in their (sorted)
+        # postings, until no remaining name can beat the best match so far
+        bounds = []
+        for index in candidates:
+            most = min(shared[index] + skipped, lengths[index], size)
+            bounds.append((most / (size + lengths[index] - most), index))
+        bounds.sort(reverse=True)
+
+        best = None
+        for bound, index in bounds:
+            if best and (bound, index) < best:
+                break
+            count = shared[index]
+            for gram in grams[size - skipped :]:
+                postings = self._postings[gram]
+                position = bisect_left(postings, index)
+                count += position < len(postings) and postings[position] == index
+            score = count / (size + lengths[index] - count)
+            if (
+                score >= MIN_SIMILARITY
+                and (best is None or (score, index) > best)
+                and shares_word(query, self._names[index])
+            ):
+                best = score, index
+
+        if best is None:
+            return None
+        score, index = best
+        return self._values[self._names[index]], score
+
+
+@dataclass(frozen=True)
+class Entry:
+    animal: str
+    name: str
+    text: str
+
+
+class KnowledgeStore:
+    """The veterinary reference data the tools answer from, indexed once.
+
+    Animals, breeds and symptoms are matched on normalized names and their aliases, and
+    fuzzily through trigram indexes, so 'Labrador Retriever', 'labradr' and 'LAB' all find
+    the labrador entry.
+    """
+
+    def __init__(self, data: dict):
+        self.animals: TrigramIndex[str] = TrigramIndex()
+        self.breeds: dict[str, TrigramIndex[Entry]] = {}
+        self.symptoms: dict[str, TrigramIndex[Entry]] = {}
+
+        for animal, aliases in data.get("animals", {}).items():
+            animal = normalize(animal)
+            for name in [animal, *aliases]:
+                self.animals.add(name, animal)
+
+        for section, indexes, text_key, name_key in (
+            ("breeds", self.breeds, "info", "breed"),
+            ("symptoms", self.symptoms, "assessment", "symptom"),
+        ):
+            for record in data.get(section, []):
+                animal = normalize(record["animal"])
+                self.animals.add(animal, animal)
+                entry = Entry(animal, record[name_key], record[text_key])
+                index = indexes.setdefault(animal, TrigramIndex())
+                for name in [record[name_key], *record.get("aliases", [])]:
+                    index.add(name, entry)
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "KnowledgeStore":
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def resolve_animal(self, animal_type: str) -> str | None:
+        match = self.animals.search(animal_type)
+        return match[0] if match else None
+
+    def breed_info(self, breed: str, animal_type: str) -> str | None:
+        match = self._find(self.breeds, breed, animal_type)
+        return match.text if match else None
+
+    def symptom_assessment(self, animal_type: str, symptoms: str) -> str | None:
+        match = self._find(self.symptoms, symptoms, animal_type)
+        return match.text if match else None
+
+    def _find(
+        self, indexes: dict[str, TrigramIndex[Entry]], name: str, animal_type: str
+    ) -> Entry | None:
+        # An animal we know nothing about gets no answer, not another species' one
+        animal = self.resolve_animal(animal_type)
+        if animal is None or animal not in indexes:
+            return None
+        match = indexes[animal].search(name)
+        return match[0] if match else None
+
+
+@cache
+def load_knowledge(path: str | None = None) -> KnowledgeStore:
+    """The knowledge store for VET_KNOWLEDGE_PATH (or the bundled data file), loaded once."""
+    return KnowledgeStore.from_file(
+        path or os.getenv("VET_KNOWLEDGE_PATH") or DEFAULT_KNOWLEDGE_PATH
+    )
@@ -0,0 +1,43 @@
+import sys
+import importlib.util
+import threading
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule(ModuleType):
+    """Stands in for a module until one of its attributes is first needed, then imports it.
+
+    The import happens under a lock, so threads racing for the first attribute all see the
+    fully imported module (importlib's own LazyLoader is not thread-safe before 3.12.3).
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._module: ModuleType | None = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Only called for attributes this stand-in lacks, i.e. the real module's
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.__name__)
+                module = self._module
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Returns module `name`, imported on first attribute access rather than now.
+
+    `ollama` and `smolagents` take hundreds of milliseconds to import (pydantic, httpx,
+    litellm...), which every script and worker paid at startup even when, like the REPLs,
+    it then sat waiting for input. Use it as `ollama = lazy_import("ollama")` and call
+    `ollama.chat(...)`; a `from ollama import chat` would import the module right away.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return LazyModule(name)
@@ -0,0 +1,202 @@
+import math
+from typing import Callable
+from common.ollama_pool import get_ollama_pool
+
+# Chat templates wrap every message in a few role/separator tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a pet owner and a veterinary assistant.
+Update the summary with the new exchanges below. Keep every fact about the animals (species, breed, age, symptoms, advice given) and drop small talk.
+Reply with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}"""
+
+
+def count_tokens(text: str) -> int:
+    """Estimates the number of tokens in a text (~4 characters per token).
+
+    It is deliberately model-agnostic and slightly pessimistic, which is what a budget needs.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    return sum(
+        count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cuts a text down to roughly `max_tokens`, keeping the start (or the end)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        return "..." + text[-max(0, max_chars - 3) :]
+    return text[: max(0, max_chars - 3)] + "..."
+
+
+def render_exchanges(turns: list[tuple[str, str]]) -> str:
+    return "\n".join(
+        f"Owner: {question}\nAssistant: {answer}" for question, answer in turns
+    )
+
+
+def make_llm_summarizer(
+    model: str, keep_alive: str | int | None = None, max_words: int = 120
+) -> Callable[[str, list[tuple[str, str]]], str]:
+    """Returns a summarizer that asks the LLM to fold old turns into the running summary."""
+
+    def summarize(summary: str, turns: list[tuple[str, str]]) -> str:
+        response = get_ollama_pool().chat(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": SUMMARY_PROMPT.format(
+                        max_words=max_words,
+                        summary=summary or "(empty)",
+                        exchanges=render_exchanges(turns),
+                    ),
+                }
+            ],
+            options={"temperature": 0, "num_ctx": 2048, "num_predict": max_words * 2},
+            keep_alive=keep_alive,
+        )
+        return response.message.content.strip()
+
+    return summarize
+
+
+def extractive_summarizer(summary: str, turns: list[tuple[str, str]]) -> str:
+    """A summarizer that needs no LLM: keeps the owner's questions, which carry the facts."""
+    questions = " ".join(question for question, _ in turns)
+    return f"{summary} The owner also asked: {questions}".strip()
+
+
+class ConversationMemory:
+    """Keeps a multi-turn conversation within a fixed token budget.
+
+    The newest turns are kept verbatim. When the history outgrows `max_tokens`, the oldest
+    turns are folded into a rolling summary, so the prompt size stays bounded no matter how
+    long the session runs.
+
+    Args:
+        max_tokens: The token budget for the summary plus the verbatim turns.
+        summarize: Folds a list of (question, answer) turns into the current summary.
+            Falls back to `extractive_summarizer` when not given or when it fails.
+        min_recent_turns: How many of the newest turns are never summarized.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        summarize: Callable[[str, list[tuple[str, str]]], str] | None = None,
+        min_recent_turns: int = 1,
+    ):
+        self.max_tokens = max_tokens
+        self.summarize = summarize or extractive_summarizer
+        self.min_recent_turns = min_recent_turns
+        self.summary = ""
+        self.turns: list[tuple[str, str]] = []
+
+    @classmethod
+    def for_context(
+        cls,
+        num_ctx: int,
+        reserved_tokens: int,
+        summarize: Callable[[str, list[tuple[str, str]]], str] | None = None,
+    ) -> "ConversationMemory":
+        """Sizes the memory to whatever is left of `num_ctx` after the reserved tokens
+        (system prompt, the new question and room for the answer)."""
+        return cls(max(64, num_ctx - reserved_tokens), summarize)
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self.turns.append((question, answer))
+        self._compact()
+
+    def messages(self) -> list[dict]:
+        """The history as chat messages, to go between the system prompt and the new question."""
+        messages = []
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": SUMMARY_PREFIX + self.summary,
+                }
+            )
+        for question, answer in self.turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    def transcript(self) -> str:
+        """The history as plain text, for prompts that are a single message."""
+        parts = []
+        if self.summary:
+            parts.append(SUMMARY_PREFIX + self.summary)
+        if self.turns:
+            parts.append(render_exchanges(self.turns))
+        return "\n".join(parts)
+
+    def token_count(self) -> int:
+        return count_message_tokens(self.messages())
+
+    def clear(self) -> None:
+        self.summary = ""
+        self.turns = []
+
+    def _compact(self) -> None:
+        if self.token_count() <= self.max_tokens:
+            return
+
+        # Fold the oldest turns until the verbatim part fits in what the summary leaves over
+        summary_budget = self.max_tokens // 3
+        evicted = []
+        while (
+            len(self.turns) > self.min_recent_turns
+            and count_message_tokens(self.messages()[1 if self.summary else 0 :])
+            > self.max_tokens - summary_budget
+        ):
+            evicted.append(self.turns.pop(0))
+
+        if evicted:
+            try:
+                self.summary = self.summarize(self.summary, evicted)
+            except Exception:
+                self.summary = extractive_summarizer(self.summary, evicted)
+            # Keep the newest facts if the summarizer overshoots its budget
+            self.summary = truncate_to_tokens(
+                self.summary,
+                summary_budget
+                - count_tokens(SUMMARY_PREFIX)
+                - MESSAGE_OVERHEAD_TOKENS
+                - 1,
+                keep_end=True,
+            )
+
+        # A single huge turn can still overflow: clip the oldest remaining answers
+        while self.token_count() > self.max_tokens and self.turns:
+            index = next(
+                (
+                    i
+                    for i, (_, answer) in enumerate(self.turns)
+                    if count_tokens(answer) > 32
+                ),
+                None,
+            )
+            if index is None:
+                break
+            question, answer = self.turns[index]
+            overflow = self.token_count() - self.max_tokens
+            self.turns[index] = (
+                question,
+                truncate_to_tokens(answer, max(32, count_tokens(answer) - overflow)),
+            )
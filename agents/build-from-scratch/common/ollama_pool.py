@@ -0,0 +1,279 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Any, Iterator
+from common.lazy import lazy_import
+
+ollama = lazy_import("ollama")
+httpx = lazy_import("httpx")
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+# Statuses worth another try, on another host when there is one
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class Host:
+    """One Ollama backend, its clients and its load."""
+
+    url: str
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    down_until: float = 0.0
+    client: Any = None
+    async_clients: weakref.WeakKeyDictionary = field(
+        default_factory=weakref.WeakKeyDictionary
+    )
+
+    def stats(self) -> dict:
+        return {
+            "host": self.url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "down": self.down_until > time.monotonic(),
+        }
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts and overloaded or failing servers are retried;
+    anything the request itself got wrong (an unknown model, a bad payload) is not."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class OllamaPool:
+    """Ollama clients for one or more hosts, with connection reuse, retries and balancing.
+
+    Each host gets one `ollama.Client` (and one `ollama.AsyncClient` per event loop), whose
+    httpx connection pool keeps connections open across requests. A request goes to the
+    healthy host with the fewest requests in flight. A retryable failure puts that host
+    out of rotation for `cooldown` seconds and the request is tried again, on another host
+    when there is one, after a jittered exponential backoff. Streams are retried only until
+    their first chunk: after that, the caller has already seen part of the answer.
+
+    Clients are created on first use, so building a pool imports nothing.
+
+    Args:
+        hosts: The Ollama base URLs to spread requests over.
+        connect_timeout: Seconds to wait for a connection.
+        timeout: Seconds to wait for any read or write once connected.
+        retries: Extra attempts after a retryable failure.
+        backoff: The base backoff in seconds; attempt n waits up to `backoff * 2**n`.
+        max_backoff: The longest backoff, in seconds.
+        cooldown: Seconds a failing host is skipped for, while others are up.
+        max_connections: The connection pool size per host.
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        connect_timeout: float = 5.0,
+        timeout: float = 300.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        cooldown: float = 10.0,
+        max_connections: int = 16,
+    ):
+        if not hosts:
+            raise ValueError("An Ollama pool needs at least one host")
+        self.hosts = [Host(url.rstrip("/")) for url in hosts]
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cooldown = cooldown
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._turn = 0
+
+    def chat(self, **kwargs) -> Any:
+        """`ollama.chat`: a ChatResponse, or an iterator of them with `stream=True`."""
+        if kwargs.get("stream"):
+            return self._stream("chat", kwargs)
+        return self._call("chat", kwargs)
+
+    def generate(self, **kwargs) -> Any:
+        if kwargs.get("stream"):
+            return self._stream("generate", kwargs)
+        return self._call("generate", kwargs)
+
+    async def achat(self, **kwargs) -> Any:
+        """Async `chat`, for a single (non-streamed) response."""
+        tried: set[str] = set()
+        for attempt in range(self.retries + 1):
+            host = self._acquire(tried)
+            try:
+                response = await self._async_client(host).chat(**kwargs)
+                self._succeeded(host)
+                return response
+            except Exception as error:
+                if not self._failed(host, error, attempt):
+                    raise
+                tried.add(host.url)
+            finally:
+                self._release(host)
+            await asyncio.sleep(self._delay(attempt))
+
+    def client(self, host: Host) -> Any:
+        """The host's blocking client, e.g. to warm a model up on every host."""
+        if host.client is None:
+            with self._lock:
+                if host.client is None:
+                    host.client = ollama.Client(
+                        host=host.url,
+                        timeout=httpx.Timeout(
+                            self.timeout, connect=self.connect_timeout
+                        ),
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                        ),
+                    )
+        return host.client
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [host.stats() for host in self.hosts]
+
+    def _async_client(self, host: Host) -> Any:
+        # httpx's async clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = host.async_clients.get(loop)
+            if client is None:
+                client = ollama.AsyncClient(
+                    host=host.url,
+                    timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                )
+                host.async_clients[loop] = client
+        return client
+
+    def _call(self, method: str, kwargs: dict) -> Any:
+        tried: set[str] = set()
+        for attempt in range(self.retries + 1):
+            host = self._acquire(tried)
+            try:
+                response = getattr(self.client(host), method)(**kwargs)
+                self._succeeded(host)
+                return response
+            except Exception as error:
+                if not self._failed(host, error, attempt):
+                    raise
+                tried.add(host.url)
+            finally:
+                self._release(host)
+            time.sleep(self._delay(attempt))
+
+    def _stream(self, method: str, kwargs: dict) -> Iterator[Any]:
+        tried: set[str] = set()
+        for attempt in range(self.retries + 1):
+            host = self._acquire(tried)
+            chunks = None
+            try:
+                chunks = getattr(self.client(host), method)(**kwargs)
+                # The request is only sent when the first chunk is asked for
+                first = next(chunks)
+            except StopIteration:
+                self._succeeded(host)
+                self._release(host)
+                return
+            except Exception as error:
+                self._release(host)
+                if not self._failed(host, error, attempt):
+                    raise
+                tried.add(host.url)
+                time.sleep(self._delay(attempt))
+                continue
+
+            self._succeeded(host)
+            try:
+                yield first
+                yield from chunks
+            finally:
+                chunks.close()
+                self._release(host)
+            return
+
+    def _acquire(self, tried: set[str]) -> Host:
+        """The least busy host that is up and not yet tried for this request."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                host
+                for host in self.hosts
+                if host.url not in tried and host.down_until <= now
+            ]
+            # Every host failed or is cooling down: better to retry one than to give up
+            candidates = candidates or [
+                host for host in self.hosts if host.url not in tried
+            ]
+            candidates = candidates or self.hosts
+
+            # Rotate the starting point so equally loaded hosts take turns
+            self._turn = (self._turn + 1) % len(self.hosts)
+            host = min(
+                candidates,
+                key=lambda host: (
+                    host.down_until > now,
+                    host.in_flight,
+                    (self.hosts.index(host) - self._turn) % len(self.hosts),
+                ),
+            )
+            host.in_flight += 1
+            host.requests += 1
+            return host
+
+    def _release(self, host: Host) -> None:
+        with self._lock:
+            host.in_flight -= 1
+
+    def _succeeded(self, host: Host) -> None:
+        host.down_until = 0.0
+
+    def _failed(self, host: Host, error: Exception, attempt: int) -> bool:
+        """Records a failure; True when the request should be tried again."""
+        if not is_retryable(error):
+            return False
+        with self._lock:
+            host.failures += 1
+            host.down_until = time.monotonic() + self.cooldown
+        return attempt < self.retries
+
+    def _delay(self, attempt: int) -> float:
+        # "Full jitter": spreads the retries of many clients instead of syncing them up
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+def hosts_from_env() -> list[str]:
+    """OLLAMA_HOSTS (comma separated), else OLLAMA_HOST, else Ollama's default address."""
+    hosts = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",")]
+    hosts = [host for host in hosts if host]
+    if hosts:
+        return hosts
+    host = os.getenv("OLLAMA_HOST", "").strip() or DEFAULT_HOST
+    return [host if "://" in host else f"http://{host}"]
+
+
+@cache
+def get_ollama_pool() -> OllamaPool:
+    """The process-wide pool, configured from the environment on first use."""
+    return OllamaPool(
+        hosts_from_env(),
+        connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")),
+        timeout=float(os.getenv("OLLAMA_TIMEOUT", "300")),
+        retries=int(os.getenv("OLLAMA_RETRIES", "2")),
+        cooldown=float(os.getenv("OLLAMA_HOST_COOLDOWN", "10")),
+        max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16")),
+    )
@@ -0,0 +1,378 @@
+"""Local passage retrieval over a memory-mapped matrix of hashed n-gram vectors.
+
+Passages are embedded with a hashing vectorizer (word stems, stem bigrams and character
+trigrams, hashed into `dim` signed buckets), L2-normalized and appended to a float32
+matrix on disk. Searches map that matrix read-only and score it in fixed-size chunks with
+one matrix-vector product each, so memory stays bounded however many passages there are,
+and every process searching the same store shares the pages through the OS page cache.
+
+IDF weights come from per-bucket document frequencies and are only applied to the query,
+so appending passages never rewrites the rows already on disk.
+
+    uv run python -m common.retrieval add passages.txt   # one passage per line, or .jsonl
+    uv run python -m common.retrieval search "labrador hip problems"
+"""
+
+import os
+import sys
+import json
+import zlib
+import argparse
+import threading
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from pathlib import Path
+import numpy as np
+from common.knowledge import DEFAULT_KNOWLEDGE_PATH, normalize
+from common.symptom_search import STOPWORDS, stem
+
+# Bump when the on-disk layout or the vectorizer changes, so stale stores are rebuilt
+STORE_FORMAT = 1
+
+CHAR_GRAM_WEIGHT = 0.25
+
+
+def _hash(gram: str) -> tuple[int, float]:
+    code = zlib.crc32(gram.encode("utf-8"))
+    return code, 1.0 if code & 0x80000000 else -1.0
+
+
+@lru_cache(maxsize=1 << 18)
+def _word_features(
+    word: str, dim: int
+) -> tuple[str | None, tuple[int, ...], tuple[float, ...]]:
+    """A word's stem (None for stopwords) and the buckets and values of its features: the
+    stem itself and its character trigrams. Vocabularies repeat, so this runs once a word.
+    """
+    term = None if word in STOPWORDS else stem(word)
+    columns, values = [], []
+    if term is not None:
+        code, sign = _hash(term)
+        columns.append(code % dim)
+        values.append(sign)
+    padded = f"#{word}#"
+    for i in range(len(padded) - 2):
+        code, sign = _hash(f"#{padded[i : i + 3]}")
+        columns.append(code % dim)
+        values.append(sign * CHAR_GRAM_WEIGHT)
+    return term, tuple(columns), tuple(values)
+
+
+class HashingVectorizer:
+    """Embeds text into `dim` buckets without a vocabulary, so the store can grow forever.
+
+    The features are word stems, stem bigrams and (at a lower weight, for typos) character
+    trigrams. The bucket and the sign of each come from its CRC32, which (unlike `hash`) is
+    the same in every process; signed buckets make collisions cancel out instead of piling up.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        # Features are gathered as flat (row * dim + column) cells and summed in one bincount
+        cells, values = [], []
+        for row, text in enumerate(texts):
+            offset = row * self.dim
+            terms = []
+            for word in normalize(text).split():
+                term, word_columns, word_values = _word_features(word, self.dim)
+                if term is not None:
+                    terms.append(term)
+                cells.extend(offset + column for column in word_columns)
+                values.extend(word_values)
+            for a, b in zip(terms, terms[1:]):
+                code, sign = _hash(f"{a} {b}")
+                cells.append(offset + code % self.dim)
+                values.append(sign)
+
+        size = len(texts) * self.dim
+        matrix = np.bincount(cells, weights=values, minlength=size)
+        return matrix.astype(np.float32).reshape(len(texts), self.dim)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@dataclass(frozen=True)
+class Passage:
+    id: int
+    text: str
+    score: float
+
+
+class PassageStore:
+    """An append-only store of passages and their vectors, searched by cosine similarity.
+
+    A store is a directory holding:
+
+    - `vectors.f32`: the row-major float32 matrix, one normalized row per passage,
+    - `passages.bin` and `offsets.u64`: the UTF-8 texts and the end offset of each,
+    - `df.npy`: how many passages have a non-zero value in each bucket,
+    - `meta.json`: the format, dimension and passage count.
+
+    `meta.json` is replaced last and atomically, so readers never see a half-written
+    append, and bytes left behind by an interrupted one are truncated by the next. Any
+    number of processes may search a store, but only one may append to it at a time.
+    Within a process, threads may search while another appends or refreshes: each search
+    works on the maps it took under the lock, which a refresh replaces but never alters.
+
+    Args:
+        path: The store directory, created if missing.
+        dim: The vector dimension of a new store; an existing store keeps its own.
+        chunk_rows: How many rows are scored per matrix-vector product, which bounds the
+            memory a search needs to `chunk_rows * dim * 4` bytes.
+    """
+
+    def __init__(self, path: str | Path, dim: int = 512, chunk_rows: int = 32768):
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self._vectors = None
+        self._texts = None
+        self._offsets = None
+        self.count = 0
+        self.dim = dim
+        self.df = np.zeros(dim, dtype=np.int64)
+        self.refresh()
+        self.vectorizer = HashingVectorizer(self.dim)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return self.count
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def refresh(self) -> None:
+        """Picks up passages appended since the store was opened, by this or another process."""
+        try:
+            mtime = self._file("meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if mtime == self._meta_mtime:
+                return
+
+            meta = json.loads(self._file("meta.json").read_text(encoding="utf-8"))
+            if meta.get("format") != STORE_FORMAT:
+                raise ValueError(
+                    f"{self.path} was written by an incompatible version; "
+                    "delete it to rebuild"
+                )
+            self._meta_mtime = mtime
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            self.df = np.load(self._file("df.npy"))
+            self._vectors = self._texts = self._offsets = None
+
+    def _map(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+        """The vectors, offsets, texts, document frequencies and count, mapped together."""
+        with self._lock:
+            if self._vectors is None and self.count:
+                self._vectors = np.memmap(
+                    self._file("vectors.f32"),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self.count, self.dim),
+                )
+                self._offsets = np.memmap(
+                    self._file("offsets.u64"),
+                    dtype=np.uint64,
+                    mode="r",
+                    shape=(self.count,),
+                )
+                self._texts = np.memmap(
+                    self._file("passages.bin"),
+                    dtype=np.uint8,
+                    mode="r",
+                    shape=(int(self._offsets[-1]),),
+                )
+            return self._vectors, self._offsets, self._texts, self.df, self.count
+
+    def append(self, texts: list[str], batch_size: int = 4096) -> int:
+        """Embeds and appends passages, in batches; returns the new passage count."""
+        with self._lock:
+            self.refresh()
+            self._truncate()
+            for start in range(0, len(texts), batch_size):
+                batch = [
+                    text for text in texts[start : start + batch_size] if text.strip()
+                ]
+                if batch:
+                    self._append_batch(batch)
+            return self.count
+
+    def _truncate(self) -> None:
+        """Drops whatever an interrupted append wrote past the committed count."""
+        end = int(self._read_offset(self.count - 1)) if self.count else 0
+        for name, size in (
+            ("vectors.f32", self.count * self.dim * 4),
+            ("offsets.u64", self.count * 8),
+            ("passages.bin", end),
+        ):
+            file = self._file(name)
+            if file.exists() and file.stat().st_size != size:
+                os.truncate(file, size)
+
+    def _read_offset(self, index: int) -> int:
+        with open(self._file("offsets.u64"), "rb") as file:
+            file.seek(index * 8)
+            return int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+
+    def _append_batch(self, texts: list[str]) -> None:
+        vectors = self.vectorizer.transform(texts)
+        # A new array rather than in place: searches may still be scoring with the old one
+        self.df = self.df + np.count_nonzero(vectors, axis=0)
+        vectors = _normalize_rows(vectors)
+
+        encoded = [text.encode("utf-8") for text in texts]
+        start = self._read_offset(self.count - 1) if self.count else 0
+        offsets = start + np.cumsum([len(data) for data in encoded], dtype=np.uint64)
+
+        with open(self._file("vectors.f32"), "ab") as file:
+            vectors.tofile(file)
+        with open(self._file("passages.bin"), "ab") as file:
+            file.write(b"".join(encoded))
+        with open(self._file("offsets.u64"), "ab") as file:
+            offsets.astype(np.uint64).tofile(file)
+
+        self.count += len(texts)
+        self._commit()
+
+    def _commit(self) -> None:
+        with open(self._file("df.npy.tmp"), "wb") as file:
+            np.save(file, self.df)
+        os.replace(self._file("df.npy.tmp"), self._file("df.npy"))
+
+        meta = {"format": STORE_FORMAT, "dim": self.dim, "count": self.count}
+        self._file("meta.json.tmp").write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+        self._meta_mtime = self._file("meta.json").stat().st_mtime_ns
+        self._vectors = self._texts = self._offsets = None
+
+    def _query_vector(self, query: str, df: np.ndarray, count: int) -> np.ndarray:
+        vector = self.vectorizer.transform([query])[0]
+        idf = np.log((1 + count) / (1 + df)) + 1
+        vector *= idf.astype(np.float32)
+        return _normalize_rows(vector[None, :])[0]
+
+    def search(self, query: str, k: int = 3) -> list[Passage]:
+        """The `k` passages most similar to the query, best first."""
+        self.refresh()
+        vectors, offsets, texts, df, count = self._map()
+        if not count:
+            return []
+
+        query_vector = self._query_vector(query, df, count)
+        if not query_vector.any():
+            return []
+
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, count, self.chunk_rows):
+            scores = vectors[start : start + self.chunk_rows] @ query_vector
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_ids = np.concatenate([best_ids, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_ids) > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_ids, best_scores = best_ids[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        return [
+            Passage(
+                int(best_ids[i]),
+                _decode(offsets, texts, int(best_ids[i])),
+                float(best_scores[i]),
+            )
+            for i in order
+            if best_scores[i] > 0
+        ]
+
+    def text(self, index: int) -> str:
+        _, offsets, texts, _, _ = self._map()
+        return _decode(offsets, texts, index)
+
+
+def _decode(offsets: np.ndarray, texts: np.ndarray, index: int) -> str:
+    start = int(offsets[index - 1]) if index else 0
+    return bytes(texts[start : int(offsets[index])]).decode("utf-8")
+
+
+def knowledge_passages(path: str | Path) -> list[str]:
+    """The breed and symptom entries of a knowledge file, as passages."""
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    passages = [
+        f"{record['breed'].title()} ({record['animal']}): {record['info']}"
+        for record in data.get("breeds", [])
+    ]
+    passages += [
+        f"{record['symptom'].capitalize()} in a {record['animal']}: {record['assessment']}"
+        for record in data.get("symptoms", [])
+    ]
+    return passages
+
+
+# `cache` may run a function more than once for concurrent first calls: seeding is not
+# something to do twice
+_SEED_LOCK = threading.Lock()
+
+
+@cache
+def load_passage_store(path: str | None = None) -> PassageStore:
+    """The passage store at VET_PASSAGES_PATH, seeded from the knowledge file when empty."""
+    with _SEED_LOCK:
+        store = PassageStore(
+            path or os.getenv("VET_PASSAGES_PATH") or ".cache/vet_passages",
+            dim=int(os.getenv("VET_PASSAGES_DIM", "512")),
+        )
+        if not len(store):
+            store.append(
+                knowledge_passages(
+                    os.getenv("VET_KNOWLEDGE_PATH") or DEFAULT_KNOWLEDGE_PATH
+                )
+            )
+        return store
+
+
+def _read_passages(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            return [json.loads(line)["text"] for line in file if line.strip()]
+        return [line.strip() for line in file if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", help="store directory (default: VET_PASSAGES_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="append passages from text or .jsonl files")
+    add.add_argument("files", nargs="+")
+    search = commands.add_parser("search", help="print the best passages for a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    store = load_passage_store(args.store)
+    if args.command == "add":
+        for path in args.files:
+            count = store.append(_read_passages(path))
+            print(f"{path}: store now holds {count} passages")
+        return
+
+    for passage in store.search(args.query, args.k):
+        print(f"{passage.score:.3f}  [{passage.id}] {passage.text}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
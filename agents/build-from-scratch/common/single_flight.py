@@ -0,0 +1,122 @@
+import re
+import threading
+from typing import Any, Callable, Hashable
+
+# Called with ("token", chunk), then once with ("done", None) or ("error", message)
+Listener = Callable[[str, Any], None]
+
+
+def normalize_question(question: str) -> str:
+    """The form two questions must share to be answered by one generation: case, spacing
+    and trailing punctuation don't change what is being asked."""
+    return re.sub(r"\s+", " ", question.casefold()).strip(" ?!.")
+
+
+class Flight:
+    """One generation in progress, fanned out to every request that asked for it.
+
+    Chunks are kept as they are published, so a request joining late is first replayed
+    what it missed and then follows along live. The flight is cancelled as soon as its last
+    listener leaves; the producer checks `cancelled` between chunks.
+    """
+
+    def __init__(self, key: Hashable | None, on_close: Callable[["Flight"], None]):
+        self.key = key
+        self.chunks: list[Any] = []
+        self.done = False
+        self.error: str | None = None
+        self.cancelled = False
+        self._listeners: list[Listener] = []
+        self._on_close = on_close
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener) -> bool:
+        """Replays the chunks so far to `listener`, then keeps it posted. False when the
+        flight was already cancelled: nobody produces it any more."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            for chunk in self.chunks:
+                listener("token", chunk)
+            if self.done:
+                self._end(listener)
+            else:
+                self._listeners.append(listener)
+            return True
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            if self._listeners or self.done or self.cancelled:
+                return
+            self.cancelled = True
+        self._on_close(self)
+
+    def publish(self, chunk: Any) -> None:
+        # Under the lock, so a joining listener gets each chunk exactly once, in order
+        with self._lock:
+            self.chunks.append(chunk)
+            for listener in self._listeners:
+                listener("token", chunk)
+
+    def finish(self, error: str | None = None) -> None:
+        with self._lock:
+            if self.done:
+                return
+            self.done = True
+            self.error = error
+            listeners, self._listeners = self._listeners, []
+            for listener in listeners:
+                self._end(listener)
+        self._on_close(self)
+
+    def _end(self, listener: Listener) -> None:
+        if self.error:
+            listener("error", self.error)
+        else:
+            listener("done", None)
+
+
+class SingleFlight:
+    """Lets identical requests in flight share one generation instead of starting their own.
+
+    The first request for a key leads: it gets a new flight and must produce it (publish
+    its chunks, then finish it). Requests for the same key arriving before it finishes
+    follow: they are subscribed to the same flight and only listen. A finished or
+    cancelled flight is forgotten, so this never serves stale answers: it is not a cache.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, Flight] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def join(self, key: Hashable | None, listener: Listener) -> tuple[Flight, bool]:
+        """Subscribes `listener` to the flight for `key`, and says whether the caller leads
+        it. A None key is never shared."""
+        with self._lock:
+            flight = self._flights.get(key) if key is not None else None
+            if flight is not None and flight.subscribe(listener):
+                self.coalesced += 1
+                return flight, False
+            flight = Flight(key, self._forget)
+            flight.subscribe(listener)
+            if key is not None:
+                self._flights[key] = flight
+            self.started += 1
+            return flight, True
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "flights": self.started,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+    def _forget(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
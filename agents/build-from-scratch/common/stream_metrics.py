@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import bisect
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Iterable, Iterator, Protocol
+
+# Upper bounds (in milliseconds) of the inter-chunk latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+
+class LatencyHistogram:
+    """A fixed-bucket histogram of latencies in milliseconds."""
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+    def to_dict(self) -> dict[str, int]:
+        return {
+            ("+Inf" if bound == float("inf") else f"<={bound:g}ms"): count
+            for bound, count in zip(self.bounds, self.counts)
+        }
+
+
+@dataclass
+class StreamStats:
+    """Timing of a single streamed generation."""
+
+    model: str
+    started_at: float
+    time_to_first_token: float | None = None
+    total_time: float = 0.0
+    chunk_count: int = 0
+    prompt_eval_count: int | None = None
+    eval_count: int | None = None
+    eval_duration: float | None = None
+    tokens_per_second: float | None = None
+    inter_chunk_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["inter_chunk_latency"] = self.inter_chunk_latency.to_dict()
+        return data
+
+
+class MetricsSink(Protocol):
+    def record(self, stats: StreamStats) -> None: ...
+
+
+class StreamRecorder:
+    """Wraps an Ollama chat stream and records its timing into a sink."""
+
+    def __init__(self, model: str, sink: MetricsSink | None):
+        self.model = model
+        self.sink = sink
+
+    def wrap(self, stream: Iterable) -> Iterator:
+        if self.sink is None:
+            yield from stream
+            return
+
+        started = time.perf_counter()
+        stats = StreamStats(model=self.model, started_at=time.time())
+        previous = None
+        final = None
+
+        for chunk in stream:
+            now = time.perf_counter()
+            if chunk.message.content:
+                if previous is None:
+                    stats.time_to_first_token = now - started
+                else:
+                    stats.inter_chunk_latency.observe((now - previous) * 1000)
+                previous = now
+                stats.chunk_count += 1
+            if chunk.done:
+                final = chunk
+            yield chunk
+
+        stats.total_time = time.perf_counter() - started
+
+        # Ollama reports server-side token counts and durations (ns) on the final chunk
+        if final is not None and final.eval_count:
+            stats.prompt_eval_count = final.prompt_eval_count
+            stats.eval_count = final.eval_count
+            stats.eval_duration = (final.eval_duration or 0) / 1e9
+            if stats.eval_duration:
+                stats.tokens_per_second = stats.eval_count / stats.eval_duration
+        elif stats.time_to_first_token is not None:
+            generation_time = stats.total_time - stats.time_to_first_token
+            if generation_time > 0:
+                stats.tokens_per_second = stats.chunk_count / generation_time
+
+        self.sink.record(stats)
+
+
+class InMemoryAggregator:
+    """Keeps running totals of every recorded stream, for dashboards and summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_tokens = 0
+        self.time_to_first_token: list[float] = []
+        self.tokens_per_second: list[float] = []
+        self.inter_chunk_latency = LatencyHistogram()
+
+    def record(self, stats: StreamStats) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_tokens += stats.eval_count or stats.chunk_count
+            if stats.time_to_first_token is not None:
+                self.time_to_first_token.append(stats.time_to_first_token)
+            if stats.tokens_per_second is not None:
+                self.tokens_per_second.append(stats.tokens_per_second)
+            self.inter_chunk_latency.merge(stats.inter_chunk_latency)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "total_tokens": self.total_tokens,
+                "time_to_first_token_p50": _percentile(self.time_to_first_token, 50),
+                "time_to_first_token_p95": _percentile(self.time_to_first_token, 95),
+                "tokens_per_second_mean": (
+                    sum(self.tokens_per_second) / len(self.tokens_per_second)
+                    if self.tokens_per_second
+                    else None
+                ),
+                "inter_chunk_latency": self.inter_chunk_latency.to_dict(),
+            }
+
+
+class JsonlSink:
+    """Appends one JSON line per recorded stream to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, stats: StreamStats) -> None:
+        line = json.dumps(stats.to_dict())
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+class MultiSink:
+    """Fans every record out to several sinks."""
+
+    def __init__(self, *sinks: MetricsSink):
+        self.sinks = sinks
+
+    def record(self, stats: StreamStats) -> None:
+        for sink in self.sinks:
+            sink.record(stats)
+
+
+def sink_from_env() -> MetricsSink | None:
+    """Builds a sink from STREAM_METRICS (comma separated: 'memory', 'jsonl'), or None."""
+    kinds = [
+        kind.strip().lower()
+        for kind in os.getenv("STREAM_METRICS", "").split(",")
+        if kind.strip()
+    ]
+
+    sinks = []
+    for kind in kinds:
+        if kind == "memory":
+            sinks.append(InMemoryAggregator())
+        elif kind == "jsonl":
+            sinks.append(
+                JsonlSink(os.getenv("STREAM_METRICS_PATH", ".metrics/streams.jsonl"))
+            )
+        else:
+            raise ValueError(f"Unknown STREAM_METRICS sink: {kind}")
+
+    if not sinks:
+        return None
+    return sinks[0] if len(sinks) == 1 else MultiSink(*sinks)
+
+
+def find_sink(sink: MetricsSink | None, kind: type) -> Any:
+    """Returns the sink of the given type, alone or in a MultiSink, e.g. to print an
+    InMemoryAggregator's summary."""
+    candidates = sink.sinks if isinstance(sink, MultiSink) else [sink]
+    return next((item for item in candidates if isinstance(item, kind)), None)
+
+
+def _percentile(values: list[float], percent: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
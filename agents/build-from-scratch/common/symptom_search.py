@@ -0,0 +1,204 @@
+import os
+import json
+import math
+import heapq
+import pickle
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from common.knowledge import DEFAULT_KNOWLEDGE_PATH, load_knowledge, normalize
+
+# Bump when the pickled layout changes, so stale index files are rebuilt
+INDEX_FORMAT = 3
+
+# Matches scoring below this are no match: one rare term of a symptom name scores well
+# above it, words shared by many entries stay below
+MIN_SCORE = 1.0
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have he her his i in is it its "
+    "my of on or our she since so that the their them they this to very was we were "
+    "what when which with yesterday today days day week weeks ago also keeps".split()
+)
+SUFFIXES = ("ing", "es", "ed", "s")
+
+
+def stem(word: str) -> str:
+    """A deliberately small stemmer: 'coughing' and 'coughs' both become 'cough'."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(word) for word in normalize(text).split() if word not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class SymptomMatch:
+    animal: str
+    symptom: str
+    assessment: str
+    urgency: str | None
+    score: float
+
+
+class SymptomIndex:
+    """BM25 search over a symptom -> condition corpus, through an inverted index.
+
+    Each document is one corpus entry, indexed by its symptom name and aliases only: the
+    assessment text talks about species and conditions ("Coughing in dogs can indicate..."),
+    so indexing it made "my dog is limping" match on "dog". A postings list per term holds
+    the ids and term frequencies of the documents containing it, as compact arrays, so a
+    query only touches the documents sharing one of its terms.
+
+    Args:
+        k1: BM25 term frequency saturation.
+        b: BM25 document length normalization.
+        min_score: The lowest score that still counts as a match.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, min_score: float = MIN_SCORE):
+        self.k1 = k1
+        self.b = b
+        self.min_score = min_score
+        self.documents: list[tuple[str, str, str]] = []
+        self.lengths = array("I")
+        # Kept up to date by `add`, so queries don't sum the lengths again
+        self.total_length = 0
+        self.postings: dict[str, tuple[array, array]] = {}
+        self.source_digest = ""
+
+    def add(self, animal: str, symptom: str, aliases: list[str], assessment: str):
+        doc_id = len(self.documents)
+        self.documents.append((normalize(animal), symptom, assessment))
+        terms = tokenize(" ".join([symptom, *aliases]))
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term, frequency in Counter(terms).items():
+            ids, frequencies = self.postings.setdefault(term, (array("I"), array("H")))
+            ids.append(doc_id)
+            frequencies.append(min(frequency, 65535))
+
+    def search(
+        self, query: str, animal: str | None = None, k: int = 3
+    ) -> list[SymptomMatch]:
+        """The `k` best matching entries for a free-text query, best first; none when
+        nothing scores at least `min_score`."""
+        count = len(self.documents)
+        if not count:
+            return []
+        average_length = self.total_length / count
+
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            ids, frequencies = postings
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for doc_id, frequency in zip(ids, frequencies):
+                if animal is not None and self.documents[doc_id][0] != animal:
+                    continue
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.lengths[doc_id] / average_length
+                )
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (
+                    self.k1 + 1
+                ) / (frequency + norm)
+
+        matches = []
+        for doc_id, score in heapq.nlargest(k, scores.items(), key=lambda i: i[1]):
+            if score < self.min_score:
+                break
+            entry_animal, symptom, assessment = self.documents[doc_id]
+            urgency = None
+            if "Urgency:" in assessment:
+                urgency = assessment.split("Urgency:", 1)[1].strip().rstrip(".")
+            matches.append(
+                SymptomMatch(entry_animal, symptom, assessment, urgency, score)
+            )
+        return matches
+
+    def save(self, path: str | Path) -> None:
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump((INDEX_FORMAT, self), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "SymptomIndex | None":
+        try:
+            with open(path, "rb") as file:
+                version, index = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return index if version == INDEX_FORMAT else None
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "SymptomIndex":
+        index = cls()
+        for record in records:
+            index.add(
+                record["animal"],
+                record["symptom"],
+                record.get("aliases", []),
+                record["assessment"],
+            )
+        return index
+
+
+def _digest(path: str | Path) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+@cache
+def load_symptom_index(
+    corpus_path: str | None = None, index_path: str | None = None
+) -> SymptomIndex:
+    """The symptom index, built on first use and persisted next to the other caches.
+
+    The corpus is the `symptoms` section of the knowledge file. A persisted index is reused
+    as long as that file is unchanged (same size and modification time), so later starts
+    skip tokenizing the corpus.
+    """
+    corpus_path = (
+        corpus_path or os.getenv("VET_KNOWLEDGE_PATH") or str(DEFAULT_KNOWLEDGE_PATH)
+    )
+    index_path = index_path or os.getenv(
+        "SYMPTOM_INDEX_PATH", ".cache/symptom_index.pickle"
+    )
+    digest = _digest(corpus_path)
+
+    index = SymptomIndex.load(index_path)
+    if index is not None and index.source_digest == digest:
+        return index
+
+    with open(corpus_path, encoding="utf-8") as file:
+        index = SymptomIndex.from_records(json.load(file).get("symptoms", []))
+    index.source_digest = digest
+    try:
+        index.save(index_path)
+    except OSError:
+        pass
+    return index
+
+
+def search_symptoms(
+    symptoms: str, animal_type: str | None = None, k: int = 3
+) -> list[SymptomMatch]:
+    """Free-text symptom search, restricted to the animal. An animal that isn't recognized
+    gets no matches rather than another species' ones."""
+    animal = None
+    if animal_type:
+        animal = load_knowledge().resolve_animal(animal_type)
+        if animal is None:
+            return []
+    return load_symptom_index().search(symptoms, animal, k)
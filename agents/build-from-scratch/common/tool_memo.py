@@ -0,0 +1,144 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any
+from common.tool_registry import ToolRegistry
+from common.tracing import Tracer
+
+
+def normalize_arguments(arguments: dict) -> str:
+    """A canonical form of tool arguments: sorted keys and case-folded strings.
+
+    The course's tools match case-insensitively, so case is the only thing folded away;
+    whitespace is kept because it can change a lookup.
+    """
+
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return value.casefold()
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        return value
+
+    return json.dumps(normalize(arguments), sort_keys=True, default=str)
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if time.monotonic() > expires_at:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ToolMemo:
+    """Memoizes tool calls for the duration of one agent run.
+
+    A call repeating an earlier one (same tool, same normalized arguments) is not run again:
+    it returns a short reference to the earlier Observation instead, which keeps the
+    prompt from growing with duplicate results. Tools registered as `pure` are also looked
+    up in, and stored to, an optional cache shared across runs.
+
+    Args:
+        tools: The registry used to run the tools.
+        shared_cache: A cross-run cache for the results of pure tools.
+        tracer: Records a `tool.call` span per call.
+    """
+
+    def __init__(
+        self,
+        tools: ToolRegistry,
+        shared_cache: TTLCache | None = None,
+        tracer: Tracer | None = None,
+    ):
+        self.tools = tools
+        self.shared_cache = shared_cache
+        self.tracer = tracer or Tracer()
+        self.steps = 0
+        self.hits = 0
+        self._seen: dict[str, tuple[int, Any]] = {}
+        # Agents may run several tool calls of one turn concurrently
+        self._lock = threading.Lock()
+
+    def key(self, name: str, arguments: dict) -> str:
+        # Compare what the tool would actually receive: known arguments, coerced
+        if name in self.tools and isinstance(arguments, dict):
+            try:
+                arguments = self.tools[name].validate(arguments)
+            except ValueError:
+                pass
+        return f"{name}:{normalize_arguments(arguments)}"
+
+    def call(self, name: str, arguments: dict) -> Any:
+        with self._lock:
+            self.steps += 1
+            step = self.steps
+        key = self.key(name, arguments)
+
+        with self.tracer.span("tool.call", tool=name) as span:
+            with self._lock:
+                seen = self._seen.get(key)
+                if seen is not None:
+                    self.hits += 1
+            if seen is not None:
+                span.set(source="duplicate")
+                step, result = seen
+                # A short excerpt keeps the reference useful even if the scratchpad was compacted
+                excerpt = str(result)
+                excerpt = excerpt if len(excerpt) <= 80 else excerpt[:77] + "..."
+                return f"Already observed in step {step} ({name} with the same input): {excerpt}"
+
+            result = self._run(name, arguments, key, span)
+            with self._lock:
+                self._seen.setdefault(key, (step, result))
+            if span.recording:
+                span.set(input_chars=len(key), result_chars=len(str(result)))
+            return result
+
+    def _run(self, name: str, arguments: dict, key: str, span) -> Any:
+        cacheable = (
+            self.shared_cache is not None
+            and name in self.tools
+            and self.tools[name].pure
+        )
+        if cacheable:
+            cached = self.shared_cache.get(key)
+            if cached is not None:
+                span.set(source="cache")
+                return cached
+
+        span.set(source="tool")
+        result = self.tools.call(name, arguments)
+
+        # Errors (unknown tool, bad arguments) are not worth keeping across runs
+        if cacheable and not (isinstance(result, str) and result.startswith("Error:")):
+            self.shared_cache.set(key, result)
+        return result
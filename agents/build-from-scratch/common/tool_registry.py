@@ -0,0 +1,288 @@
+import re
+import json
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, get_type_hints
+
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+ARGS_SECTION = re.compile(r"^\s*Args:\s*$")
+SECTION_HEADER = re.compile(r"^\s*\w[\w ]*:\s*$")
+ARG_LINE = re.compile(r"^\s*(\w+)(?:\s*\([^)]*\))?:\s*(.*)$")
+
+_MISSING = object()
+
+
+class ToolArgumentError(ValueError):
+    """Raised when arguments for a tool are missing or cannot be coerced."""
+
+
+def _coerce_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "yes", "1"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "no", "0"):
+        return False
+    if isinstance(value, (int, float)):
+        return bool(value)
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _coerce_json(kind: type) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, kind):
+            raise ValueError(f"not a {kind.__name__}: {value!r}")
+        return value
+
+    return coerce
+
+
+def _coerce_str(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+COERCERS: dict[type, Callable[[Any], Any]] = {
+    str: _coerce_str,
+    int: lambda value: int(value),
+    float: lambda value: float(value),
+    bool: _coerce_bool,
+    list: _coerce_json(list),
+    dict: _coerce_json(dict),
+}
+
+
+def parse_docstring(doc: str | None) -> tuple[str, dict[str, str]]:
+    """Splits a Google-style docstring into its summary and its `Args:` descriptions."""
+    lines = inspect.cleandoc(doc or "").splitlines()
+    summary = []
+    for line in lines:
+        if not line.strip() or ARGS_SECTION.match(line):
+            break
+        summary.append(line.strip())
+
+    descriptions: dict[str, str] = {}
+    in_args = False
+    current = None
+    for line in lines:
+        if ARGS_SECTION.match(line):
+            in_args = True
+            continue
+        if not in_args:
+            continue
+        if SECTION_HEADER.match(line) and not line.startswith((" ", "\t")):
+            break
+        match = ARG_LINE.match(line)
+        if (
+            match
+            and line.startswith(("    ", "\t"))
+            and not line.startswith("        ")
+        ):
+            current = match.group(1)
+            descriptions[current] = match.group(2).strip()
+        elif current and line.strip():
+            descriptions[current] += " " + line.strip()
+
+    return " ".join(summary), descriptions
+
+
+@dataclass(frozen=True)
+class ToolParameter:
+    name: str
+    annotation: type
+    json_type: str
+    description: str
+    required: bool
+    default: Any
+    coerce: Callable[[Any], Any]
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Everything the agents need about one tool, introspected once at registration."""
+
+    name: str
+    func: Callable[..., Any]
+    description: str
+    parameters: dict[str, ToolParameter]
+    schema: dict
+    manifest: str
+    pure: bool = False
+    timeout: float | None = None
+
+    def validate(self, arguments: dict) -> dict:
+        """Keeps the known arguments, coerces them to the annotated types and checks required ones."""
+        validated = {}
+        for name, parameter in self.parameters.items():
+            value = arguments.get(name, _MISSING)
+            if value is _MISSING or value is None:
+                if parameter.required:
+                    raise ToolArgumentError(
+                        f"Missing argument '{name}' for tool '{self.name}'"
+                    )
+                continue
+            try:
+                validated[name] = parameter.coerce(value)
+            except (TypeError, ValueError) as e:
+                raise ToolArgumentError(
+                    f"Invalid argument '{name}' for tool '{self.name}': {e}"
+                ) from None
+        return validated
+
+
+def build_spec(
+    func: Callable[..., Any],
+    name: str | None = None,
+    pure: bool = False,
+    timeout: float | None = None,
+):
+    """Introspects a tool function: signature, annotations and docstring."""
+    name = name or func.__name__
+    description, arg_descriptions = parse_docstring(func.__doc__)
+    hints = get_type_hints(func)
+
+    parameters = {}
+    for parameter in inspect.signature(func).parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        annotation = hints.get(parameter.name, str)
+        parameters[parameter.name] = ToolParameter(
+            name=parameter.name,
+            annotation=annotation,
+            json_type=JSON_TYPES.get(annotation, "string"),
+            description=arg_descriptions.get(parameter.name, ""),
+            required=parameter.default is parameter.empty,
+            default=None if parameter.default is parameter.empty else parameter.default,
+            coerce=COERCERS.get(annotation, lambda value: value),
+        )
+
+    schema = {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    parameter.name: {
+                        "type": parameter.json_type,
+                        "description": parameter.description,
+                    }
+                    for parameter in parameters.values()
+                },
+                "required": [
+                    parameter.name
+                    for parameter in parameters.values()
+                    if parameter.required
+                ],
+            },
+        },
+    }
+
+    return ToolSpec(
+        name=name,
+        func=func,
+        description=description,
+        parameters=parameters,
+        schema=schema,
+        manifest=f"{name}: {func.__doc__}",
+        pure=pure,
+        timeout=timeout,
+    )
+
+
+class ToolRegistry:
+    """A set of tools shared by every agent style in the course.
+
+    Each tool is introspected once when it is registered; the manifest lines for ReAct
+    prompts, the JSON schemas for tool calling and the argument validators are cached, and
+    dispatch is a dictionary lookup.
+    """
+
+    def __init__(self, tools: list[Callable[..., Any]] | None = None):
+        self._specs: dict[str, ToolSpec] = {}
+        self._manifest: list[str] | None = None
+        self._schemas: list[dict] | None = None
+        for func in tools or []:
+            self.register(func)
+
+    def register(
+        self,
+        func: Callable[..., Any] | None = None,
+        *,
+        name: str | None = None,
+        pure: bool = False,
+        timeout: float | None = None,
+    ):
+        """Registers a tool. Usable as `registry.register(func)` or as a decorator.
+
+        Args:
+            func: The tool function, documented with a Google-style docstring.
+            name: The name exposed to the model, defaults to the function name.
+            pure: Whether the tool always returns the same result for the same arguments,
+                which makes its results safe to cache.
+            timeout: How many seconds agents wait for the tool before giving up on it,
+                None for their default.
+        """
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            spec = build_spec(func, name, pure, timeout)
+            self._specs[spec.name] = spec
+            self._manifest = None
+            self._schemas = None
+            return func
+
+        return decorator(func) if func else decorator
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __getitem__(self, name: str) -> ToolSpec:
+        return self._specs[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def specs(self) -> list[ToolSpec]:
+        return list(self._specs.values())
+
+    def manifest(self) -> list[str]:
+        """The 'name: docstring' lines used by the ReAct prompt."""
+        if self._manifest is None:
+            self._manifest = [spec.manifest for spec in self._specs.values()]
+        return self._manifest
+
+    def schemas(self) -> list[dict]:
+        """The tool definitions in the JSON schema format Ollama's `tools=` expects."""
+        if self._schemas is None:
+            self._schemas = [spec.schema for spec in self._specs.values()]
+        return self._schemas
+
+    def call(self, name: str, arguments: dict) -> Any:
+        """Validates the arguments and calls the tool.
+
+        Unknown tools and bad arguments come back as error strings, so the model can see
+        what went wrong and try again.
+        """
+        spec = self._specs.get(name)
+        if spec is None:
+            return "Error: Tool not found"
+        try:
+            validated = spec.validate(arguments if isinstance(arguments, dict) else {})
+        except ToolArgumentError as e:
+            return f"Error: {e}"
+        return spec.func(**validated)
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import random
+import secrets
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
+
+
+@dataclass
+class Span:
+    """One timed operation: an agent run, an iteration, an LLM call or a tool call."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    started_at: float
+    duration_ms: float | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    recording = True
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off or the trace was not sampled."""
+
+    recording = False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# The span the current code runs under; NOOP_SPAN marks an unsampled trace
+_current: contextvars.ContextVar[Span | _NoopSpan | None] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class _SpanContext:
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._token = None
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.span.duration_ms = (time.perf_counter() - self._started) * 1000
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        self.tracer.exporter.export(self.span)
+
+
+class Tracer:
+    """Creates nested spans and hands finished ones to an exporter.
+
+    Nesting follows the caller's context (`contextvars`), so a span opened inside another
+    becomes its child; use `propagate` for work handed to other threads. Whether a trace is
+    recorded is decided once, at its root span, with probability `sample_rate`. When there
+    is no exporter, or the trace was not sampled, `span` returns a shared no-op span, so
+    callers pay almost nothing; check `span.recording` before computing costly attributes.
+
+    Args:
+        exporter: Receives every finished span. None disables tracing.
+        sample_rate: The fraction of traces (agent runs) to record.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def span(self, name: str, **attributes: Any) -> _SpanContext | _NoopSpan:
+        if self.exporter is None:
+            return NOOP_SPAN
+
+        parent = _current.get()
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                # Children of an unsampled root must not start traces of their own
+                return _UnsampledContext()
+            trace_id, parent_id = secrets.token_hex(8), None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=secrets.token_hex(4),
+            parent_id=parent_id,
+            started_at=time.time(),
+            attributes=attributes,
+        )
+        return _SpanContext(self, span)
+
+
+class _UnsampledContext:
+    """Marks the rest of an unsampled trace as not recorded."""
+
+    recording = False
+
+    def __enter__(self) -> _NoopSpan:
+        self._token = _current.set(NOOP_SPAN)
+        return NOOP_SPAN
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+
+
+def propagate(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Binds `func` to the caller's context, so spans it opens on another thread nest
+    under the caller's current span."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+
+    return run
+
+
+def render_trace(spans: list[Span]) -> str:
+    """Renders the spans of one trace as an indented tree, with timings and attributes."""
+    children: dict[str | None, list[Span]] = {}
+    for span in spans:
+        children.setdefault(span.parent_id, []).append(span)
+
+    known = {span.span_id for span in spans}
+    roots = [span for span in spans if span.parent_id not in known]
+
+    lines = []
+
+    def visit(span: Span, depth: int) -> None:
+        attributes = " ".join(
+            f"{key}={value}" for key, value in span.attributes.items()
+        )
+        error = f" error={span.error!r}" if span.error else ""
+        lines.append(
+            f"{'  ' * depth}{span.name} {span.duration_ms or 0:.1f}ms {attributes}{error}".rstrip()
+        )
+        for child in sorted(children.get(span.span_id, []), key=lambda s: s.started_at):
+            visit(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s.started_at):
+        visit(root, 0)
+    return "\n".join(lines)
+
+
+class InMemoryExporter:
+    """Keeps finished spans in memory, grouped by trace, for a local look at where time goes."""
+
+    def __init__(self, max_traces: int = 100):
+        self.max_traces = max_traces
+        self.traces: dict[str, list[Span]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.traces.setdefault(span.trace_id, []).append(span)
+            while len(self.traces) > self.max_traces:
+                self.traces.pop(next(iter(self.traces)))
+
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return [span for spans in self.traces.values() for span in spans]
+
+    def render(self, last: int | None = None) -> str:
+        """The recorded traces (or the `last` few) as indented trees."""
+        with self._lock:
+            traces = list(self.traces.values())
+        if last is not None:
+            traces = traces[-last:]
+        return "\n\n".join(render_trace(spans) for spans in traces)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.traces.clear()
+
+
+class ConsoleExporter:
+    """Prints each trace as a tree once its root span finishes."""
+
+    def __init__(self):
+        self._pending: dict[str, list[Span]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            spans = self._pending.setdefault(span.trace_id, [])
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del self._pending[span.trace_id]
+        print("-" * 80)
+        print(render_trace(spans))
+        print("-" * 80)
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+class MultiExporter:
+    """Fans every span out to several exporters."""
+
+    def __init__(self, *exporters: SpanExporter):
+        self.exporters = exporters
+
+    def export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+
+
+def tracer_from_env(console: bool = False) -> Tracer:
+    """Builds a tracer from TRACING (comma separated: 'console', 'memory', 'jsonl'),
+    TRACING_PATH and TRACING_SAMPLE_RATE. `console` adds the console exporter, which is
+    what LOG_ACTIVITY now turns on."""
+    kinds = [
+        kind.strip().lower()
+        for kind in os.getenv("TRACING", "").split(",")
+        if kind.strip()
+    ]
+    if console and "console" not in kinds:
+        kinds.append("console")
+
+    exporters = []
+    for kind in kinds:
+        if kind == "console":
+            exporters.append(ConsoleExporter())
+        elif kind == "memory":
+            exporters.append(InMemoryExporter())
+        elif kind == "jsonl":
+            exporters.append(
+                JsonlExporter(os.getenv("TRACING_PATH", ".metrics/traces.jsonl"))
+            )
+        else:
+            raise ValueError(f"Unknown TRACING exporter: {kind}")
+
+    if not exporters:
+        return Tracer()
+    exporter = exporters[0] if len(exporters) == 1 else MultiExporter(*exporters)
+    return Tracer(exporter, float(os.getenv("TRACING_SAMPLE_RATE", "1.0")))
+
+
+def find_exporter(tracer: Tracer, kind: type) -> Any:
+    """Returns the tracer's exporter of the given type, e.g. to render an InMemoryExporter."""
+    exporter = tracer.exporter
+    candidates = (
+        exporter.exporters if isinstance(exporter, MultiExporter) else [exporter]
+    )
+    return next((item for item in candidates if isinstance(item, kind)), None)
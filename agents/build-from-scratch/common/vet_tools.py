@@ -0,0 +1,61 @@
+from common.knowledge import load_knowledge
+from common.symptom_search import search_symptoms
+
+
+def get_breed_info(breed: str, animal_type: str) -> str:
+    """Retrieves breed-specific health information, common conditions, and care requirements.
+
+    Args:
+        breed: The breed of the animal for which information is requested.
+        animal_type: The type of animal (e.g., 'dog', 'cat').
+
+    Returns:
+        A string containing health information, common conditions, and care requirements for the specified breed.
+        If the breed or animal type is not found, returns a default message with the breed and animal type.
+    """
+    info = load_knowledge().breed_info(breed, animal_type)
+    return info or f"Breed: {breed}, Animal Type: {animal_type}"
+
+
+def check_symptoms(animal_type: str, symptoms: str) -> str:
+    """Analyzes symptoms and provides an initial assessment for animals.
+
+    Args:
+        animal_type: The type of animal (e.g., 'dog', 'cat').
+        symptoms: A description of the symptoms observed in the animal.
+
+    Returns:
+        A string containing an assessment of the symptoms, including potential conditions and urgency.
+        If the symptoms or animal type are not recognized, returns a message indicating that further assessment is needed.
+    """
+    # Free text may name several symptoms; misspelt single symptoms fall back to fuzzy names
+    matches = search_symptoms(symptoms, animal_type)
+    if matches:
+        potential_conditions = " ".join(match.assessment for match in matches)
+    else:
+        potential_conditions = load_knowledge().symptom_assessment(
+            animal_type, symptoms
+        )
+    potential_conditions = (
+        potential_conditions or "Unknown symptoms. Further assessment needed."
+    )
+    return f"Animal Type: {animal_type}, Symptoms: {symptoms}, Assessment: {potential_conditions}"
+
+
+def search_vet_knowledge(query: str) -> str:
+    """Searches the veterinary knowledge base for passages relevant to a question.
+
+    Args:
+        query: What to look up, in plain words (e.g., 'labrador hip problems').
+
+    Returns:
+        A string listing the most relevant passages, best first.
+        If nothing relevant is found, returns a message saying so.
+    """
+    # numpy (behind the passage store) is only imported once the tool is first used
+    from common.retrieval import load_passage_store
+
+    passages = load_passage_store().search(query, k=3)
+    if not passages:
+        return f"No passages found for: {query}"
+    return "\n".join(f"{i}. {passage.text}" for i, passage in enumerate(passages, 1))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from common.lazy import lazy_import
+from common.ollama_pool import OllamaPool, get_ollama_pool
+
+ollama = lazy_import("ollama")
+
+
+def keep_alive_policy() -> str | int | None:
+    """Reads how long Ollama should keep models loaded after a request.
+
+    OLLAMA_KEEP_ALIVE accepts Ollama durations ("10m", "24h"), seconds ("3600"), a negative
+    number to keep the model loaded forever, or "0" to unload right after each request.
+    Unset means Ollama's own default (5 minutes).
+    """
+    value = os.getenv("OLLAMA_KEEP_ALIVE", "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+@dataclass
+class WarmupResult:
+    model: str
+    host: str | None = None
+    cold_seconds: float | None = None
+    warm_seconds: float | None = None
+    load_seconds: float | None = None
+    error: str | None = None
+
+
+def _warm_model(
+    client: ollama.Client, host: str, model: str, keep_alive: str | int | None
+) -> WarmupResult:
+    result = WarmupResult(model=model, host=host)
+    try:
+        # A generate request without a prompt only loads the model into memory
+        started = time.perf_counter()
+        response = client.generate(model=model, keep_alive=keep_alive)
+        result.cold_seconds = time.perf_counter() - started
+        result.load_seconds = (response.load_duration or 0) / 1e9
+
+        started = time.perf_counter()
+        client.generate(model=model, keep_alive=keep_alive)
+        result.warm_seconds = time.perf_counter() - started
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+def warm_up(
+    models: list[str | None],
+    keep_alive: str | int | None = None,
+    pool: OllamaPool | None = None,
+) -> list[WarmupResult]:
+    """Loads the given models concurrently so the first real question doesn't pay for it.
+
+    Each model is loaded on every host of the pool, since any of them may get the question.
+    It is requested twice: the first (cold) request includes the load time, the second
+    (warm) one shows the latency once the model is resident.
+    """
+    pool = pool or get_ollama_pool()
+    unique_models = list(dict.fromkeys(model for model in models if model))
+    targets = [(host, model) for host in pool.hosts for model in unique_models]
+    if not targets:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        return list(
+            executor.map(
+                lambda target: _warm_model(
+                    pool.client(target[0]), target[0].url, target[1], keep_alive
+                ),
+                targets,
+            )
+        )
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+
+
+def print_warmup_report(results: list[WarmupResult]) -> None:
+    # The host only tells results apart when there are several
+    show_host = len({result.host for result in results}) > 1
+    for result in results:
+        name = f"{result.model} on {result.host}" if show_host else result.model
+        if result.error:
+            print(f"🔥 Warm-up failed for {name}: {result.error}")
+        else:
+            print(
+                f"🔥 Warmed up {name}: cold {result.cold_seconds:.2f}s "
+                f"(load {result.load_seconds:.2f}s), warm {result.warm_seconds:.2f}s"
+            )
@@ -0,0 +1,611 @@
+"""Serves the four chapters' assistants over HTTP, streaming answers as Server-Sent Events.
+
+    POST /v1/chat     chapter-1: a plain LLM call
+    POST /v1/react    chapter-2: the ReAct agent
+    POST /v1/tools    chapter-3: the tool-calling agent
+    POST /v1/agent    chapter-4: the smolagents agent
+    DELETE /v1/agent/sessions/<id>   ends a chapter-4 session, freeing its agent
+    GET  /healthz     liveness, and whether the server is draining
+    GET  /metrics     admission and outcome counters
+
+The body is JSON: `{"question": "...", "stream": true, "timeout": 30, "session_id": "..."}`.
+With `stream` (the default when the client accepts `text/event-stream`) the answer arrives
+as `token` events followed by one `done` event, or an `error` event; otherwise as a single
+JSON object. Chapter-4 answers arrive as a single `token` event unless AGENT_REPHRASE=true,
+as the agent's final answer can't be streamed. `session_id` only matters to chapter-4,
+whose agents keep per-session memory; sessions end when deleted or after
+AGENT_POOL_IDLE_TIMEOUT seconds without a question (checked every EVICT_INTERVAL seconds),
+and /metrics reports the pool under `agent_pool`.
+
+At most SERVER_CONCURRENCY answers are generated at once, on worker threads, and at most
+SERVER_QUEUE_SIZE more wait for a slot; anything beyond that is refused with 429 straight
+away instead of queueing without bound. Each request has a deadline (its `timeout`, capped
+by SERVER_REQUEST_TIMEOUT) covering the wait and the generation; when it passes, the
+generation is abandoned at its next chunk.
+
+Identical questions asked while one is being answered (same route and session, equal once
+normalized) don't start a generation of their own: they join the one in progress, are
+replayed what was already streamed and follow along (`coalesced` in /metrics). They take
+no worker and no queue place; set SERVER_COALESCE=false to answer each on its own. On
+SIGINT/SIGTERM the server stops accepting
+connections, lets in-flight requests finish for up to SERVER_SHUTDOWN_GRACE seconds, and
+then cancels the rest.
+
+To try it without Ollama, point it at the fake server:
+
+    python -m common.fake_ollama --port 11435 --latency 0.2 --token-latency 0.02
+    OLLAMA_HOST=http://127.0.0.1:11435 OLLAMA_API_BASE=http://127.0.0.1:11435 uv run python -m server
+    curl -N localhost:8000/v1/chat -d '{"question": "My dog is coughing"}' -H 'Accept: text/event-stream'
+"""
+
+import os
+import json
+import time
+import signal
+import asyncio
+import argparse
+from dataclasses import dataclass, field
+from collections import Counter
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Callable, Iterator
+from dotenv import load_dotenv
+from common.chapters import load_chapter
+from common.single_flight import Flight, SingleFlight, normalize_question
+
+load_dotenv(dotenv_path=".env.local")
+
+MAX_BODY_BYTES = 64 * 1024
+READ_TIMEOUT = 10.0
+EVICT_INTERVAL = 60.0
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+def _react(module: ModuleType, question: str, session_id: str | None) -> Iterator[str]:
+    # The ReAct loop only knows its answer once it reaches the Final Answer
+    yield module.execute_react_agent(
+        question, module.tools_manifest(module.TOOLS), module.TOOLS
+    )
+
+
+# route -> (chapter, answer stream factory)
+ROUTES: dict[str, tuple[str, Callable[..., Iterator[str]]]] = {
+    "chat": (
+        "chapter-1",
+        lambda module, question, session_id: module.stream_llm(question),
+    ),
+    "react": ("chapter-2", _react),
+    "tools": (
+        "chapter-3",
+        lambda module, question, session_id: module.stream_llm(question),
+    ),
+    "agent": (
+        "chapter-4",
+        lambda module, question, session_id: module.stream_agent(
+            question, session_id=session_id
+        ),
+    ),
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes = b""
+
+
+@dataclass
+class Metrics:
+    counters: Counter = field(default_factory=Counter)
+    admitted: int = 0
+    running: int = 0
+    following: int = 0
+
+    def snapshot(self, server: "AgentServer") -> dict:
+        flights = server.flights.stats()
+        return {
+            **self.counters,
+            "running": self.running,
+            "queued": self.admitted - self.running,
+            "following": self.following,
+            "flights": flights["flights"],
+            "coalesced": flights["coalesced"],
+            "concurrency": server.concurrency,
+            "queue_size": server.queue_size,
+            "stopping": server.stopping,
+            **{
+                f"{route}_pool": pool.stats()
+                for route, pool in server.agent_pools.items()
+            },
+        }
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Request headers too large")
+
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Malformed Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Bodies are limited to {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), path.split("?", 1)[0], headers, body)
+
+
+def _head(status: int, headers: dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def write_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    payload: dict,
+    headers: dict | None = None,
+) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        _head(
+            status,
+            {
+                "Content-Type": "application/json",
+                "Content-Length": len(body),
+                "Connection": "close",
+                **(headers or {}),
+            },
+        )
+        + body
+    )
+    await writer.drain()
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class AgentServer:
+    """An asyncio HTTP front-end over the chapters' blocking answer generators.
+
+    Args:
+        modules: The loaded chapter module behind each served route.
+        concurrency: How many answers are generated at once (worker threads).
+        queue_size: How many more requests may wait for a worker before 429s.
+        request_timeout: The longest deadline a request may ask for, in seconds.
+        shutdown_grace: Seconds in-flight requests get to finish on shutdown.
+        coalesce: Whether identical requests in flight share one generation.
+    """
+
+    def __init__(
+        self,
+        modules: dict[str, ModuleType],
+        concurrency: int = 4,
+        queue_size: int = 16,
+        request_timeout: float = 120.0,
+        shutdown_grace: float = 30.0,
+        coalesce: bool = True,
+    ):
+        self.modules = modules
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.request_timeout = request_timeout
+        self.shutdown_grace = shutdown_grace
+        self.coalesce = coalesce
+        self.flights = SingleFlight()
+        self.metrics = Metrics()
+        self.stopping = False
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="serve")
+        self._slots: asyncio.Semaphore | None = None
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.Task] = set()
+        self._evictor: asyncio.Task | None = None
+        # Routes whose agents are pooled per session (chapter-4's AGENT_POOL)
+        self.agent_pools = {
+            route: module.AGENT_POOL
+            for route, module in modules.items()
+            if getattr(module, "AGENT_POOL", None) is not None
+        }
+
+    async def start(self, host: str, port: int) -> None:
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        if self.agent_pools:
+            self._evictor = asyncio.create_task(self._evict_idle())
+
+    async def _evict_idle(self) -> None:
+        """Ends idle sessions even when no new question comes to do it on checkout."""
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            for pool in self.agent_pools.values():
+                pool.evict_idle()
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_until_signalled(self) -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await stop.wait()
+        await self.shutdown()
+
+    async def shutdown(self) -> None:
+        """Stops accepting, drains in-flight requests for `shutdown_grace`, cancels the rest."""
+        self.stopping = True
+        self._server.close()
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._connections:
+            print(f"Draining {len(self._connections)} connection(s)...")
+            _, pending = await asyncio.wait(
+                set(self._connections), timeout=self.shutdown_grace
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        started = time.perf_counter()
+        status = 500
+        request = None
+        try:
+            request = await asyncio.wait_for(read_request(reader), READ_TIMEOUT)
+            status = await self._dispatch(request, writer)
+        except HttpError as error:
+            status = error.status
+            with suppress(ConnectionError):
+                await write_json(writer, status, {"error": str(error)}, error.headers)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            status = 408
+        except ConnectionError:
+            pass
+        except Exception as error:
+            with suppress(ConnectionError):
+                await write_json(
+                    writer, 500, {"error": f"{type(error).__name__}: {error}"}
+                )
+        finally:
+            self.metrics.counters[f"status_{status}"] += 1
+            if request is not None:
+                print(
+                    f"{request.method} {request.path} {status} "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms"
+                )
+            writer.close()
+            self._connections.discard(task)
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        if request.path == "/healthz":
+            await write_json(
+                writer, 200, {"status": "stopping" if self.stopping else "ok"}
+            )
+            return 200
+        if request.path == "/metrics":
+            await write_json(writer, 200, self.metrics.snapshot(self))
+            return 200
+
+        route = request.path.removeprefix("/v1/")
+        if "/sessions/" in route:
+            return await self._end_session(request, writer, route)
+        if route == request.path or route not in self.modules:
+            raise HttpError(404, f"No route {request.path}")
+        if request.method != "POST":
+            raise HttpError(405, "Use POST", {"Allow": "POST"})
+        if self.stopping:
+            raise HttpError(503, "Shutting down", {"Retry-After": 5})
+
+        question, session_id, timeout, stream = self._parse_body(request)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        started = time.perf_counter()
+
+        # The flight hands this request its chunks through this queue
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def listen(kind: str, value: str | None) -> None:
+            with suppress(RuntimeError):
+                # Raises once the event loop is gone: the server was stopped
+                loop.call_soon_threadsafe(chunks.put_nowait, (kind, value))
+
+        key = (
+            (route, session_id, normalize_question(question)) if self.coalesce else None
+        )
+        flight, leader = self.flights.join(key, listen)
+        try:
+            if not leader:
+                self.metrics.following += 1
+                try:
+                    return await self._respond(
+                        writer, chunks, stream, started, deadline, True
+                    )
+                finally:
+                    self.metrics.following -= 1
+
+            # Admission: refuse at once rather than queue without bound
+            if self.metrics.admitted >= self.concurrency + self.queue_size:
+                self.metrics.counters["rejected"] += 1
+                flight.finish("Too many requests in flight")
+                raise HttpError(429, "Too many requests in flight", {"Retry-After": 1})
+
+            self.metrics.admitted += 1
+            try:
+                await self._generate(flight, route, question, session_id, deadline)
+                return await self._respond(
+                    writer, chunks, stream, started, deadline, False
+                )
+            finally:
+                self.metrics.admitted -= 1
+        finally:
+            # The last request to leave cancels the generation
+            flight.unsubscribe(listen)
+
+    def _parse_body(self, request: Request) -> tuple[str, str | None, float, bool]:
+        """The question, session id, timeout and stream flag of a body; 400 if malformed."""
+        try:
+            body = json.loads(request.body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HttpError(400, "The body must be JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "The body must be a JSON object")
+
+        question = body.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HttpError(400, "'question' must be a non-empty string")
+        session_id = body.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HttpError(400, "'session_id' must be a string")
+        timeout = body.get("timeout", self.request_timeout)
+        # bool is an int, and NaN compares false to everything
+        if (
+            isinstance(timeout, bool)
+            or not isinstance(timeout, (int, float))
+            or not timeout > 0
+        ):
+            raise HttpError(400, "'timeout' must be a positive number of seconds")
+        stream = body.get(
+            "stream", "text/event-stream" in request.headers.get("accept", "")
+        )
+        if not isinstance(stream, bool):
+            raise HttpError(400, "'stream' must be true or false")
+        return question, session_id, min(timeout, self.request_timeout), stream
+
+    async def _end_session(
+        self, request: Request, writer: asyncio.StreamWriter, route: str
+    ) -> int:
+        route, _, session_id = route.partition("/sessions/")
+        if route not in self.agent_pools or not session_id:
+            raise HttpError(404, f"No route {request.path}")
+        if request.method != "DELETE":
+            raise HttpError(405, "Use DELETE", {"Allow": "DELETE"})
+        # Waits for nothing: a session mid-run is ended once that run is over
+        self.agent_pools[route].end_session(session_id)
+        await write_json(writer, 200, {"session_id": session_id, "ended": True})
+        return 200
+
+    async def _generate(
+        self,
+        flight: Flight,
+        route: str,
+        question: str,
+        session_id: str | None,
+        deadline: float,
+    ) -> None:
+        """Starts producing the flight on a worker, once a slot frees up."""
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.metrics.counters["deadline_exceeded"] += 1
+            flight.finish("Deadline exceeded while queued")
+            raise HttpError(504, "Deadline exceeded while queued")
+
+        _, produce = ROUTES[route]
+        module = self.modules[route]
+
+        def generate() -> None:
+            answer = None
+            try:
+                answer = produce(module, question, session_id)
+                for text in answer:
+                    if flight.cancelled:
+                        return
+                    flight.publish(text)
+                flight.finish()
+            except Exception as error:
+                flight.finish(f"{type(error).__name__}: {error}")
+            finally:
+                flight.finish("Abandoned")
+                # Closes the model's stream too when the answer was abandoned
+                close = getattr(answer, "close", None)
+                if close is not None:
+                    close()
+
+        self.metrics.running += 1
+        future = self._executor.submit(generate)
+
+        def finished(_) -> None:
+            # The slot frees when the worker really stops, not when the client gives up
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass
+
+        future.add_done_callback(finished)
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        chunks: asyncio.Queue,
+        stream: bool,
+        started: float,
+        deadline: float,
+        coalesced: bool,
+    ) -> int:
+        loop = asyncio.get_running_loop()
+        pieces = []
+        if stream:
+            writer.write(
+                _head(
+                    200,
+                    {
+                        "Content-Type": "text/event-stream",
+                        "Cache-Control": "no-cache",
+                        "Connection": "close",
+                        "X-Accel-Buffering": "no",
+                    },
+                )
+            )
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                kind, value = await asyncio.wait_for(chunks.get(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                self.metrics.counters["deadline_exceeded"] += 1
+                if not stream:
+                    raise HttpError(504, "Deadline exceeded")
+                writer.write(sse_event("error", {"error": "Deadline exceeded"}))
+                await writer.drain()
+                return 200
+
+            if kind == "token":
+                pieces.append(value)
+                if stream:
+                    writer.write(sse_event("token", {"text": value}))
+                    await writer.drain()
+                continue
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            if kind == "error":
+                self.metrics.counters["errors"] += 1
+                if not stream:
+                    raise HttpError(500, value)
+                writer.write(sse_event("error", {"error": value}))
+            else:
+                self.metrics.counters["completed"] += 1
+                answer = {
+                    "answer": "".join(pieces),
+                    "elapsed_ms": elapsed_ms,
+                    "coalesced": coalesced,
+                }
+                if not stream:
+                    await write_json(writer, 200, answer)
+                    return 200
+                writer.write(sse_event("done", answer))
+            await writer.drain()
+            return 200
+
+    def _release(self) -> None:
+        self.metrics.running -= 1
+        self._slots.release()
+
+
+def load_routes(routes: list[str]) -> dict[str, ModuleType]:
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        raise ValueError(f"Unknown routes: {', '.join(unknown)}")
+    return {route: load_chapter(ROUTES[route][0]) for route in routes}
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = AgentServer(
+        load_routes(args.routes),
+        concurrency=args.concurrency,
+        queue_size=args.queue_size,
+        request_timeout=args.request_timeout,
+        shutdown_grace=args.shutdown_grace,
+        coalesce=args.coalesce,
+    )
+    await server.start(args.host, args.port)
+    print(
+        f"Serving {', '.join('/v1/' + route for route in args.routes)} "
+        f"on http://{args.host}:{server.port}"
+    )
+    await server.serve_until_signalled()
+    print("Stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("SERVER_PORT", "8000"))
+    )
+    parser.add_argument(
+        "--routes",
+        nargs="*",
+        default=os.getenv("SERVER_ROUTES", ",".join(ROUTES)).split(","),
+        help="which assistants to serve",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=int(os.getenv("SERVER_CONCURRENCY", "4"))
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=int(os.getenv("SERVER_QUEUE_SIZE", "16"))
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=float(os.getenv("SERVER_REQUEST_TIMEOUT", "120")),
+    )
+    parser.add_argument(
+        "--shutdown-grace",
+        type=float,
+        default=float(os.getenv("SERVER_SHUTDOWN_GRACE", "30")),
+    )
+    parser.add_argument(
+        "--coalesce",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("SERVER_COALESCE", "true").lower() == "true",
+        help="let identical requests in flight share one answer",
+    )
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""One fake Ollama server for the whole test run, with the chapters pointed at it."""
+
+import os
+import importlib
+from functools import cache
+from types import ModuleType
+from common.chapters import load_chapter
+from common.fake_ollama import FakeOllama, default_responder
+
+
+@cache
+def fake_ollama() -> FakeOllama:
+    """Starts the fake and points everything at it. The chapters and the Ollama pool read
+    these settings once, so this must run before the first chapter is loaded."""
+    fake = FakeOllama().start()
+    os.environ.update(
+        OLLAMA_HOST=fake.url,
+        OLLAMA_API_BASE=fake.url,
+        OLLAMA_MODEL="fake",
+        OLLAMA_TOOL_CALLING_MODEL="fake",
+        OLLAMA_WARMUP="false",
+        LITELLM_LOCAL_MODEL_COST_MAP="True",
+        LLM_CACHE="false",
+        LOG_ACTIVITY="false",
+        STREAM_METRICS="",
+        TRACING="",
+    )
+    return fake
+
+
+def reset_fake(**settings) -> FakeOllama:
+    """The fake, back to instant echoing answers (or `settings`) with no requests recorded."""
+    fake = fake_ollama()
+    fake.responder = settings.get("responder", default_responder)
+    fake.latency = settings.get("latency", 0.0)
+    fake.token_latency = settings.get("token_latency", 0.0)
+    fake.prompt_token_latency = 0.0
+    fake.error_status = None
+    fake.requests.clear()
+    return fake
+
+
+def chapter(name: str) -> ModuleType:
+    fake_ollama()
+    return load_chapter(name)
+
+
+def chapter_module(name: str, module: str) -> ModuleType:
+    """One of a chapter's own modules (e.g. chapter-2's `action_parser`), imported the
+    way the chapter imports it."""
+    chapter(name)
+    return importlib.import_module(module)
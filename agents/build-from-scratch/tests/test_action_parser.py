@@ -0,0 +1,115 @@
+import unittest
+from tests.support import chapter_module
+
+action_parser = chapter_module("chapter-2", "action_parser")
+
+
+def parse(*chunks: str, finish: bool = True):
+    parser = action_parser.StreamingActionParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    if finish:
+        parser.finish()
+    return parser
+
+
+class StreamingActionParserTest(unittest.TestCase):
+    def test_action_and_input(self):
+        parser = parse(
+            'Thought: I need the breed.\nAction: get_breed_info\nAction Input: {"breed": "lab"}\n'
+        )
+        self.assertEqual(parser.action, "get_breed_info")
+        self.assertEqual(parser.action_input, '{"breed": "lab"}')
+
+    def test_action_mentioned_in_a_thought_is_ignored(self):
+        parser = parse(
+            "Thought: The Action: plan is\n"
+            "Action: get_breed_info\n"
+            'Action Input: {"breed": "lab"}\n'
+        )
+        self.assertEqual(parser.action, "get_breed_info")
+        self.assertEqual(parser.action_input, '{"breed": "lab"}')
+
+    def test_input_marker_mentioned_after_the_action_is_ignored(self):
+        parser = parse(
+            "Action: get_breed_info because no Action Input: yet\n"
+            'Action Input: {"breed": "lab"}\n'
+        )
+        self.assertEqual(parser.action_input, '{"breed": "lab"}')
+
+    def test_json_split_across_chunks_completes_when_balanced(self):
+        parser = action_parser.StreamingActionParser()
+        chunks = [
+            "Action: get_",
+            "breed_info\nAction Input: {",
+            '"breed": "l',
+            'ab"',
+            "}",
+        ]
+        ready = [parser.feed(chunk) for chunk in chunks]
+        self.assertEqual(ready, [False, False, False, False, True])
+        self.assertEqual(parser.action, "get_breed_info")
+        self.assertEqual(parser.action_input, '{"breed": "lab"}')
+
+    def test_brackets_inside_strings_do_not_close_the_input(self):
+        parser = parse('Action: x\nAction Input: {"text": "a } \\" ]"}', finish=False)
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.action_input, '{"text": "a } \\" ]"}')
+
+    def test_multiline_json_on_the_line_after_the_marker(self):
+        parser = parse(
+            "Action: check_symptoms\nAction Input:\n",
+            '{\n  "animal_type": "dog",\n',
+            '  "symptoms": "coughing"\n}\nmore text',
+            finish=False,
+        )
+        self.assertTrue(parser.complete)
+        self.assertEqual(
+            parser.action_input,
+            '{\n  "animal_type": "dog",\n  "symptoms": "coughing"\n}',
+        )
+
+    def test_fenced_json_input(self):
+        for text in (
+            'Action: x\nAction Input: ```json\n{"a": 1}\n```\n',
+            'Action: x\nAction Input:\n```\n{"a": 1}\n```\n',
+        ):
+            with self.subTest(text=text):
+                parser = parse(*text)
+                self.assertEqual(parser.action_input, '{"a": 1}')
+
+    def test_plain_input_waits_for_the_newline(self):
+        parser = action_parser.StreamingActionParser()
+        self.assertFalse(parser.feed("Action: get_breed_info\nAction Input: lab"))
+        self.assertTrue(parser.feed("rador\n"))
+        self.assertEqual(parser.action_input, "labrador")
+
+    def test_input_at_the_end_of_the_stream_completes_on_finish(self):
+        parser = parse("Action: get_breed_info\nAction Input: labrador", finish=False)
+        self.assertFalse(parser.complete)
+        parser.finish()
+        self.assertEqual(parser.action_input, "labrador")
+
+    def test_observation_ends_the_step(self):
+        parser = parse(
+            "Action: get_breed_info\nAction Input: labrador\nObservation: made up",
+            "\nThought: more",
+            finish=False,
+        )
+        self.assertTrue(parser.halted)
+        self.assertNotIn("Observation", parser.text)
+        self.assertEqual(parser.action_input, "labrador")
+
+        parser = parse("Thought: hm\nObservation: made up\nAction: x\n", finish=False)
+        self.assertTrue(parser.halted)
+        self.assertIsNone(parser.action)
+
+    def test_final_answer(self):
+        parser = parse("Thought: I know it.\nFinal Answer: Labradors ", "are friendly.")
+        self.assertEqual(parser.final_answer, "Labradors are friendly.")
+        self.assertFalse(parser.complete)
+        self.assertIsNone(parser.action)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+import threading
+from common.agent_pool import AgentPool, PoolExhausted
+
+
+class Agent:
+    def __init__(self):
+        self.memory = []
+        self.running = 0
+
+
+def reset(agent: Agent) -> None:
+    agent.memory.clear()
+
+
+class AgentPoolTest(unittest.TestCase):
+    def test_a_session_keeps_its_agent_and_memory(self):
+        pool = AgentPool(Agent, reset)
+        with pool.checkout("a") as lease:
+            self.assertEqual(lease.turns, 0)
+            lease.agent.memory.append("first question")
+            agent = lease.agent
+        with pool.checkout("a") as lease:
+            self.assertIs(lease.agent, agent)
+            self.assertEqual(lease.turns, 1)
+            self.assertEqual(lease.agent.memory, ["first question"])
+
+    def test_idle_sessions_end_and_unused_agents_are_dropped(self):
+        pool = AgentPool(Agent, reset, idle_timeout=0.05)
+        with pool.checkout("a") as lease:
+            lease.agent.memory.append("secret")
+
+        time.sleep(0.08)
+        pool.evict_idle()
+        self.assertEqual(pool.stats()["sessions"], 0)
+        self.assertEqual(pool.stats()["free"], 1)
+        with pool.checkout("b") as lease:
+            # The agent moved to a new session with its memory reset
+            self.assertEqual(lease.agent.memory, [])
+
+        time.sleep(0.08)
+        pool.evict_idle()  # ends "b"
+        time.sleep(0.08)
+        pool.evict_idle()  # drops its agent
+        self.assertEqual(pool.stats()["agents"], 0)
+
+    def test_the_pool_never_holds_more_than_max_size_agents(self):
+        pool = AgentPool(Agent, reset, max_size=2, wait_timeout=0.05)
+        with pool.checkout("a"), pool.checkout("b"):
+            with self.assertRaises(PoolExhausted):
+                with pool.checkout("c"):
+                    pass
+        self.assertEqual(pool.stats()["agents"], 2)
+
+        # Once idle, the least recently used session gives its agent up
+        with pool.checkout("c") as lease:
+            self.assertEqual(pool.stats()["agents"], 2)
+            self.assertEqual(lease.turns, 0)
+        self.assertEqual(pool.stats()["sessions"], 2)
+
+    def test_concurrent_runs_of_one_session_take_turns(self):
+        pool = AgentPool(Agent, reset, max_size=4)
+        overlaps = []
+        lock = threading.Lock()
+
+        def run():
+            with pool.checkout("a") as lease:
+                with lock:
+                    lease.agent.running += 1
+                    overlaps.append(lease.agent.running)
+                time.sleep(0.05)
+                with lock:
+                    lease.agent.running -= 1
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(overlaps, [1, 1, 1])
+        self.assertEqual(pool.stats()["agents"], 1)
+
+    def test_ending_a_busy_session_waits_for_its_run(self):
+        pool = AgentPool(Agent, reset)
+        with pool.checkout("a") as lease:
+            lease.agent.memory.append("secret")
+            pool.end_session("a")
+            self.assertEqual(lease.agent.memory, ["secret"])
+        self.assertEqual(lease.agent.memory, [])
+        self.assertEqual(pool.stats()["sessions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
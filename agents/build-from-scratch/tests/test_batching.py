@@ -0,0 +1,70 @@
+import time
+import asyncio
+import unittest
+from common.batching import gather_bounded
+from tests.support import chapter, reset_fake
+
+
+class GatherBoundedTest(unittest.TestCase):
+    def test_results_keep_input_order(self):
+        async def answer(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        factories = [
+            lambda value=value: answer(value, 0.01 * (3 - value)) for value in range(4)
+        ]
+        self.assertEqual(asyncio.run(gather_bounded(factories)), [0, 1, 2, 3])
+
+    def test_failures_and_timeouts_are_returned_not_raised(self):
+        async def fail():
+            raise ValueError("boom")
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def ok():
+            return "ok"
+
+        results = asyncio.run(gather_bounded([fail, hang, ok], timeout=0.05))
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIsInstance(results[1], asyncio.TimeoutError)
+        self.assertEqual(results[2], "ok")
+
+    def test_concurrency_is_bounded(self):
+        running = peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        asyncio.run(gather_bounded([work] * 10, max_concurrency=3))
+        self.assertEqual(peak, 3)
+
+
+class CallLlmBatchTest(unittest.TestCase):
+    def test_answers_every_question_in_order(self):
+        module = chapter("chapter-1")
+        # The first call imports ollama; keep that out of the timing
+        asyncio.run(module.call_llm_batch(["warm up"], cache=None))
+        fake = reset_fake(latency=0.1)
+
+        started = time.perf_counter()
+        answers = asyncio.run(
+            module.call_llm_batch(["one", "two", "three"], cache=None)
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(
+            answers, [f"This is a fake answer to: {q}" for q in ("one", "two", "three")]
+        )
+        self.assertEqual(len(fake.requests), 3)
+        # Concurrent, not one after the other
+        self.assertLess(elapsed, 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
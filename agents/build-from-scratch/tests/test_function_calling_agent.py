@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+from tests.support import chapter, reset_fake
+
+
+def breed_then_answer(request: dict) -> dict:
+    """Calls get_breed_info with a preamble, then answers once the result is in."""
+    if request["messages"][-1]["role"] == "tool":
+        return {"content": "Labradors are friendly."}
+    return {
+        "content": "Let me check. ",
+        "tool_calls": [
+            {
+                "function": {
+                    "name": "get_breed_info",
+                    "arguments": {"breed": "labrador", "animal_type": "dog"},
+                }
+            }
+        ],
+    }
+
+
+class ToolRoundsTest(unittest.TestCase):
+    def setUp(self):
+        self.module = chapter("chapter-3")
+        self.fake = reset_fake(responder=breed_then_answer)
+
+    def test_streamed_and_blocking_answers_match(self):
+        answer = self.module.call_llm("Tell me about labradors")
+        streamed = "".join(self.module.stream_llm("Tell me about labradors"))
+
+        self.assertEqual(answer, "Let me check. Labradors are friendly.")
+        self.assertEqual(streamed, answer)
+
+    def test_answer_streams_before_the_round_ends(self):
+        events = []
+        chat = self.module._chat
+
+        def recording_chat(**kwargs):
+            for chunk in chat(**kwargs):
+                events.append("done" if chunk.done else "chunk")
+                yield chunk
+
+        with mock.patch.object(self.module, "_chat", recording_chat):
+            for _ in self.module.stream_llm("Tell me about labradors"):
+                events.append("yield")
+
+        # Both rounds (the preamble, then the answer) yield text before their done chunk
+        rounds = " ".join(events).split("done")
+        self.assertEqual(len(rounds), 3)
+        for round_events in rounds[:2]:
+            self.assertIn("chunk yield", round_events)
+
+    def test_tool_results_are_sent_back(self):
+        self.module.call_llm("Tell me about labradors")
+
+        tool_messages = [
+            message
+            for message in self.fake.requests[-1]["body"]["messages"]
+            if message["role"] == "tool"
+        ]
+        self.assertEqual(len(tool_messages), 1)
+        self.assertIn("labrador", tool_messages[0]["content"].lower())
+
+
+if __name__ == "__main__":
+    unittest.main()
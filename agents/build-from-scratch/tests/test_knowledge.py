@@ -0,0 +1,55 @@
+import time
+import random
+import unittest
+from benchmarks.knowledge import breed_names, build_index, misspell
+from common.knowledge import edit_distance, load_knowledge
+
+
+class KnowledgeStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = load_knowledge()
+
+    def test_names_aliases_and_typos_match(self):
+        for breed in ("labrador", "Labrador Retriever", "LAB", "labradr"):
+            with self.subTest(breed=breed):
+                self.assertIsNotNone(self.store.breed_info(breed, "dog"))
+        self.assertIsNotNone(self.store.breed_info("siamse", "kitty"))
+        self.assertIsNotNone(self.store.symptom_assessment("dog", "coughng"))
+
+    def test_look_alike_names_do_not_match(self):
+        self.assertIsNone(self.store.breed_info("labradoodle", "dog"))
+
+    def test_unknown_animals_get_no_answer(self):
+        self.assertIsNone(self.store.symptom_assessment("hamster", "sneezing"))
+        self.assertIsNone(self.store.breed_info("siamese", "rabbit"))
+
+    def test_edit_distance_counts_swaps_as_one_edit(self):
+        self.assertEqual(edit_distance("poodel", "poodle"), 1)
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+
+
+class LargeIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.names = breed_names(50_000)
+        cls.index = build_index(cls.names)
+
+    def test_fuzzy_lookups_take_under_a_millisecond(self):
+        rng = random.Random(1)
+        names = rng.sample(self.names, 300)
+        queries = [misspell(name, rng) for name in names]
+
+        start = time.perf_counter()
+        matches = [self.index.search(query) for query in queries]
+        mean_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        found = sum(
+            match is not None and match[0] == name
+            for match, name in zip(matches, names)
+        )
+        self.assertGreaterEqual(found, 290)
+        self.assertLess(mean_ms, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import time
+import unittest
+import threading
+from common.fake_ollama import FakeOllama
+from common.lazy import lazy_import
+from common.ollama_pool import OllamaPool
+
+ollama = lazy_import("ollama")
+
+MESSAGES = [{"role": "user", "content": "Is my dog ok?"}]
+
+
+class OllamaPoolTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.hosts = [FakeOllama().start(), FakeOllama().start()]
+
+    @classmethod
+    def tearDownClass(cls):
+        for fake in cls.hosts:
+            fake.stop()
+
+    def setUp(self):
+        self.failing, self.healthy = self.hosts
+        for fake in self.hosts:
+            fake.requests.clear()
+            fake.error_status = None
+            fake.latency = 0.0
+        self.failing.error_status = 503
+
+    def pool(self, **options) -> OllamaPool:
+        options = {"backoff": 0.001, "max_backoff": 0.001, **options}
+        pool = OllamaPool([fake.url for fake in self.hosts], **options)
+        self.addCleanup(
+            lambda: [host.client._client.close() for host in pool.hosts if host.client]
+        )
+        return pool
+
+    def chat(self, pool: OllamaPool, stream: bool = False) -> str:
+        if stream:
+            chunks = pool.chat(model="fake", messages=MESSAGES, stream=True)
+            return "".join(chunk.message.content for chunk in chunks)
+        return pool.chat(model="fake", messages=MESSAGES).message.content
+
+    def test_a_failing_host_fails_over_to_the_other(self):
+        pool = self.pool()
+        # Equally idle hosts take turns, so one of the two requests starts on the failing host
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                self.assertIn("Is my dog ok?", self.chat(pool, stream))
+
+        stats = {host["host"]: host for host in pool.stats()}
+        self.assertTrue(stats[self.failing.url]["down"])
+        self.assertGreaterEqual(stats[self.failing.url]["failures"], 1)
+        self.assertEqual(stats[self.healthy.url]["failures"], 0)
+
+    def test_a_failed_host_is_skipped_until_its_cooldown_ends(self):
+        pool = self.pool(cooldown=0.3)
+        for _ in range(5):
+            self.chat(pool)
+        # Only the first request that landed on it, if any, reached the failing host
+        self.assertLessEqual(len(self.failing.requests), 1)
+        self.assertEqual(len(self.healthy.requests), 5)
+
+        self.failing.error_status = None
+        self.failing.requests.clear()
+        time.sleep(0.35)
+        for _ in range(4):
+            self.chat(pool)
+        self.assertGreater(len(self.failing.requests), 0)
+
+    def test_retries_are_bounded(self):
+        self.healthy.error_status = 503
+        pool = self.pool(retries=2)
+        with self.assertRaises(ollama.ResponseError):
+            self.chat(pool)
+        attempts = sum(len(fake.requests) for fake in self.hosts)
+        self.assertEqual(attempts, 3)
+        # Both hosts were tried before one was tried again
+        self.assertTrue(all(fake.requests for fake in self.hosts))
+
+    def test_request_errors_are_not_retried(self):
+        for fake in self.hosts:
+            fake.error_status = 404
+        pool = self.pool(retries=2)
+        with self.assertRaises(ollama.ResponseError):
+            self.chat(pool)
+        self.assertEqual(sum(len(fake.requests) for fake in self.hosts), 1)
+
+    def test_backoff_is_jittered_and_capped(self):
+        pool = OllamaPool(["http://unused"], backoff=0.25, max_backoff=1.0)
+        delays = [pool._delay(attempt) for attempt in range(6) for _ in range(50)]
+        self.assertTrue(all(0 <= delay <= 1.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertTrue(all(pool._delay(0) <= 0.25 for _ in range(50)))
+
+    def test_requests_in_flight_go_to_the_least_busy_host(self):
+        self.failing.error_status = None
+        for fake in self.hosts:
+            fake.latency = 0.2
+        pool = self.pool()
+        threads = [threading.Thread(target=self.chat, args=(pool,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([len(fake.requests) for fake in self.hosts], [2, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import threading
+import unittest
+from common.retrieval import PassageStore
+
+PASSAGES = [
+    "Labradors are prone to hip dysplasia and obesity.",
+    "Siamese cats are vocal and social.",
+    "Coughing in dogs can indicate kennel cough or heart disease.",
+]
+
+
+class PassageStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def test_appended_passages_are_found(self):
+        store = PassageStore(self.path, dim=256)
+        self.assertEqual(store.search("labrador"), [])
+        self.assertEqual(store.append(PASSAGES), 3)
+
+        best = store.search("labrador hips", k=2)
+        self.assertEqual(best[0].text, PASSAGES[0])
+        self.assertLessEqual(len(best), 2)
+        self.assertEqual(store.search("my dog keeps coughing")[0].id, 2)
+
+    def test_a_reopened_store_has_the_same_passages(self):
+        PassageStore(self.path, dim=256).append(PASSAGES)
+
+        store = PassageStore(self.path, dim=64)
+        self.assertEqual(store.dim, 256)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.text(1), PASSAGES[1])
+        self.assertEqual(store.search("siamese cat")[0].text, PASSAGES[1])
+
+    def test_appends_by_another_store_are_picked_up(self):
+        reader = PassageStore(self.path, dim=256)
+        reader.append(PASSAGES[:1])
+        PassageStore(self.path).append(PASSAGES[1:])
+        self.assertEqual(len(reader), 3)
+        self.assertEqual(reader.search("siamese cat")[0].text, PASSAGES[1])
+
+    def test_searches_while_appending(self):
+        store = PassageStore(self.path, dim=256)
+        store.append(PASSAGES)
+        errors = []
+        appended = threading.Event()
+
+        def search():
+            while not appended.is_set():
+                try:
+                    best = store.search("labrador hips", k=3)
+                    self.assertEqual(best[0].text, PASSAGES[0])
+                except Exception as error:
+                    errors.append(error)
+                    return
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for number in range(50):
+            store.append([f"Note {number} about parrots and their feathers."] * 5)
+        appended.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store), 3 + 250)
+        self.assertIn("parrots", store.search("parrot feathers")[0].text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from tests.support import chapter_module
+
+scratchpad = chapter_module("chapter-2", "scratchpad")
+
+
+def add_step(pad, number: int, thought_words: int = 60) -> None:
+    thought = " ".join(["pondering"] * thought_words)
+    pad.add(
+        f'{thought} {number}\nAction: get_breed_info\nAction Input: {{"n": {number}}}',
+        action="get_breed_info",
+        action_input=f'{{"n": {number}}}',
+        observation=f"Result {number}: " + "x" * 200,
+    )
+
+
+class ScratchpadTest(unittest.TestCase):
+    def test_steps_are_appended_until_the_budget_is_reached(self):
+        pad = scratchpad.Scratchpad(max_tokens=10_000)
+        previous = pad.render()
+        for number in range(5):
+            add_step(pad, number)
+            self.assertTrue(pad.render().startswith(previous))
+            previous = pad.render()
+        self.assertFalse(any(step.compact for step in pad.steps))
+
+    def test_observations_are_capped_when_added(self):
+        pad = scratchpad.Scratchpad(max_tokens=10_000, max_observation_tokens=10)
+        pad.add("Thought", "x", "{}", "y" * 1000)
+        self.assertLessEqual(len(pad.steps[0].observation), 40)
+
+    def test_older_steps_are_compacted_within_the_budget(self):
+        pad = scratchpad.Scratchpad(max_tokens=1000, keep_recent=2)
+        for number in range(5):
+            add_step(pad, number)
+
+        self.assertLessEqual(pad.token_count(), 1000)
+        self.assertEqual(pad.dropped, 0)
+        self.assertTrue(pad.steps[0].compact)
+        self.assertNotIn("pondering", pad.steps[0].text())
+        self.assertIn("Action Input", pad.steps[0].text())
+        # The recent steps stay verbatim
+        self.assertFalse(any(step.compact for step in pad.steps[-2:]))
+        self.assertIn("pondering", pad.steps[-1].text())
+
+    def test_compaction_leaves_room_so_the_next_steps_append(self):
+        pad = scratchpad.Scratchpad(max_tokens=800, keep_recent=1)
+        for number in range(4):
+            add_step(pad, number)
+        self.assertLessEqual(pad.token_count(), 800 * 0.75)
+
+        # The next step fits in the room left, so nothing before it is rewritten
+        previous = pad.render()
+        add_step(pad, 4, thought_words=5)
+        self.assertTrue(pad.render().startswith(previous))
+
+    def test_dropped_steps_are_noted(self):
+        pad = scratchpad.Scratchpad(max_tokens=300, keep_recent=1)
+        for number in range(6):
+            add_step(pad, number)
+
+        self.assertGreater(pad.dropped, 0)
+        self.assertLessEqual(pad.token_count(), 300)
+        note = f"({pad.dropped} earlier steps omitted)"
+        self.assertTrue(pad.render().startswith(f" {note}\nThought:"))
+        self.assertEqual(pad.messages()[0], {"role": "user", "content": note})
+        self.assertIn("Result 5", pad.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
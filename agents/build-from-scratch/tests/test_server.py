@@ -0,0 +1,166 @@
+import io
+import json
+import types
+import asyncio
+import unittest
+from contextlib import redirect_stdout
+from common.agent_pool import AgentPool
+from tests.support import chapter, reset_fake
+import server
+
+
+async def http(
+    port: int,
+    method: str,
+    path: str,
+    body: bytes | dict | list | None = None,
+    headers: dict | None = None,
+) -> tuple[int, str]:
+    """One request to the server under test: its status and decoded body."""
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    body = body or b""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = [f"{method} {path} HTTP/1.1", f"Content-Length: {len(body)}"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), rest.partition(b"\r\n\r\n")[2].decode("utf-8")
+
+
+def sse_events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+class AgentServerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.fake = reset_fake()
+        self.chat = chapter("chapter-1")
+        # The server logs every request
+        self.enterContext(redirect_stdout(io.StringIO()))
+
+    async def serve(self, modules: dict | None = None, **options) -> server.AgentServer:
+        agent_server = server.AgentServer(modules or {"chat": self.chat}, **options)
+        await agent_server.start("127.0.0.1", 0)
+        self.addAsyncCleanup(agent_server.shutdown)
+        return agent_server
+
+    def chat_requests(self, question: str) -> int:
+        return sum(
+            question in json.dumps(record["body"])
+            for record in list(self.fake.requests)
+            if record["path"] == "/api/chat"
+        )
+
+    async def test_answers_as_json_and_as_events(self):
+        agent_server = await self.serve()
+        status, text = await http(
+            agent_server.port,
+            "POST",
+            "/v1/chat",
+            {"question": "My dog is coughing", "stream": False},
+        )
+        self.assertEqual(status, 200)
+        answer = json.loads(text)["answer"]
+        self.assertIn("My dog is coughing", answer)
+
+        status, text = await http(
+            agent_server.port,
+            "POST",
+            "/v1/chat",
+            {"question": "My dog is coughing"},
+            {"Accept": "text/event-stream"},
+        )
+        self.assertEqual(status, 200)
+        events = sse_events(text)
+        self.assertEqual(events[-1][0], "done")
+        tokens = "".join(data["text"] for event, data in events if event == "token")
+        self.assertEqual(tokens, events[-1][1]["answer"])
+        self.assertEqual(tokens, answer)
+
+    async def test_malformed_bodies_are_bad_requests(self):
+        agent_server = await self.serve()
+        for body in (
+            b"not json",
+            ["My dog is coughing"],
+            {"question": "  "},
+            {"question": "My dog is coughing", "session_id": ["a"]},
+            {"question": "My dog is coughing", "timeout": "soon"},
+            {"question": "My dog is coughing", "timeout": -1},
+            {"question": "My dog is coughing", "stream": "yes"},
+        ):
+            with self.subTest(body=body):
+                status, _ = await http(agent_server.port, "POST", "/v1/chat", body)
+                self.assertEqual(status, 400)
+        self.assertEqual(self.fake.requests, [])
+
+    async def test_requests_beyond_the_queue_are_refused(self):
+        self.fake.latency = 0.5
+        agent_server = await self.serve(concurrency=1, queue_size=0)
+        first = asyncio.create_task(
+            http(agent_server.port, "POST", "/v1/chat", {"question": "First"})
+        )
+        await asyncio.sleep(0.1)
+        status, _ = await http(
+            agent_server.port, "POST", "/v1/chat", {"question": "Second"}
+        )
+        self.assertEqual(status, 429)
+        self.assertEqual((await first)[0], 200)
+        self.assertEqual(agent_server.metrics.counters["rejected"], 1)
+
+    async def test_deadline_exceeded_is_a_gateway_timeout(self):
+        self.fake.latency = 0.5
+        agent_server = await self.serve()
+        status, _ = await http(
+            agent_server.port,
+            "POST",
+            "/v1/chat",
+            {"question": "Too slow", "timeout": 0.1, "stream": False},
+        )
+        self.assertEqual(status, 504)
+        self.assertEqual(agent_server.metrics.counters["deadline_exceeded"], 1)
+
+    async def test_identical_questions_share_one_generation(self):
+        self.fake.latency = 0.3
+        agent_server = await self.serve(concurrency=1, queue_size=0)
+        responses = await asyncio.gather(
+            *(
+                http(
+                    agent_server.port,
+                    "POST",
+                    "/v1/chat",
+                    {"question": question, "stream": False},
+                )
+                for question in ("Is my cat ok?", "is my cat OK", " Is my  cat ok")
+            )
+        )
+        self.assertEqual([status for status, _ in responses], [200] * 3)
+        answers = [json.loads(text) for _, text in responses]
+        self.assertEqual(len({answer["answer"] for answer in answers}), 1)
+        self.assertEqual(sum(answer["coalesced"] for answer in answers), 2)
+        self.assertEqual(self.chat_requests("cat"), 1)
+        self.assertEqual(agent_server.metrics.snapshot(agent_server)["coalesced"], 2)
+
+    async def test_sessions_can_be_ended(self):
+        pool = AgentPool(object, reset=lambda agent: None)
+        with pool.checkout("a"):
+            pass
+        agent = types.SimpleNamespace(AGENT_POOL=pool)
+        agent_server = await self.serve({"agent": agent})
+
+        status, text = await http(agent_server.port, "GET", "/metrics")
+        self.assertEqual(json.loads(text)["agent_pool"]["sessions"], 1)
+        status, _ = await http(agent_server.port, "DELETE", "/v1/agent/sessions/a")
+        self.assertEqual(status, 200)
+        self.assertEqual(pool.stats()["sessions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
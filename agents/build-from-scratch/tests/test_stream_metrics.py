@@ -0,0 +1,25 @@
+import unittest
+from common.stream_metrics import (
+    InMemoryAggregator,
+    JsonlSink,
+    MultiSink,
+    StreamStats,
+    find_sink,
+)
+
+
+class FindSinkTest(unittest.TestCase):
+    def test_aggregator_is_found_alone_or_among_other_sinks(self):
+        aggregator = InMemoryAggregator()
+        sink = MultiSink(JsonlSink("/dev/null"), aggregator)
+        self.assertIs(find_sink(aggregator, InMemoryAggregator), aggregator)
+        self.assertIs(find_sink(sink, InMemoryAggregator), aggregator)
+        self.assertIsNone(find_sink(JsonlSink("/dev/null"), InMemoryAggregator))
+        self.assertIsNone(find_sink(None, InMemoryAggregator))
+
+        sink.record(StreamStats(model="fake", started_at=0.0, chunk_count=3))
+        self.assertEqual(aggregator.summary()["calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+from common.knowledge import DEFAULT_KNOWLEDGE_PATH
+from common.symptom_search import SymptomIndex, load_symptom_index, search_symptoms
+from common.vet_tools import check_symptoms
+
+
+class SymptomSearchTest(unittest.TestCase):
+    def test_names_and_aliases_match(self):
+        matches = search_symptoms("he keeps throwing up", "dog")
+        self.assertEqual([match.symptom for match in matches], ["vomiting"])
+        matches = search_symptoms("coughing and vomiting", "dog")
+        self.assertEqual({match.symptom for match in matches}, {"coughing", "vomiting"})
+
+    def test_words_from_assessments_do_not_match(self):
+        self.assertEqual(search_symptoms("my dog is limping", "dog"), [])
+        self.assertIn("Unknown symptoms", check_symptoms("dog", "my dog is limping"))
+
+    def test_unknown_animals_get_no_matches(self):
+        self.assertEqual(search_symptoms("sneezing", "hamster"), [])
+
+    def test_a_reloaded_index_scores_the_same(self):
+        index = load_symptom_index(str(DEFAULT_KNOWLEDGE_PATH))
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "index")
+        index.save(path)
+        reloaded = SymptomIndex.load(path)
+        self.assertEqual(reloaded.total_length, sum(index.lengths))
+        self.assertEqual(
+            reloaded.search("coughing and vomiting", "dog"),
+            index.search("coughing and vomiting", "dog"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import time
+import unittest
+from common.tool_memo import TTLCache, ToolMemo
+from common.tool_registry import ToolRegistry
+from common.tracing import InMemoryExporter, Tracer
+
+
+class Lookups:
+    """Tools that count how often they really run."""
+
+    def __init__(self):
+        self.runs = 0
+        self.registry = ToolRegistry()
+        self.registry.register(self.breed_info, pure=True)
+        self.registry.register(self.weather)
+
+    def breed_info(self, breed: str) -> str:
+        """Describes a breed.
+
+        Args:
+            breed: The breed to describe.
+        """
+        self.runs += 1
+        return f"{breed.title()}s are friendly."
+
+    def weather(self, city: str) -> str:
+        """The current weather.
+
+        Args:
+            city: The city.
+        """
+        self.runs += 1
+        return f"Sunny in {city}"
+
+
+class ToolMemoTest(unittest.TestCase):
+    def setUp(self):
+        self.tools = Lookups()
+        self.exporter = InMemoryExporter()
+
+    def memo(self, cache: TTLCache | None = None) -> ToolMemo:
+        return ToolMemo(self.tools.registry, cache, Tracer(self.exporter))
+
+    def sources(self) -> list[str]:
+        return [span.attributes["source"] for span in self.exporter.spans()]
+
+    def test_a_repeated_call_refers_to_the_earlier_observation(self):
+        memo = self.memo()
+        first = memo.call("breed_info", {"breed": "labrador"})
+        memo.call("weather", {"city": "Oslo"})
+        again = memo.call("breed_info", {"breed": "LABRADOR"})
+
+        self.assertEqual(self.tools.runs, 2)
+        self.assertEqual(memo.hits, 1)
+        self.assertEqual(
+            again,
+            "Already observed in step 1 (breed_info with the same input): " + first,
+        )
+        self.assertEqual(self.sources(), ["tool", "tool", "duplicate"])
+
+    def test_other_runs_reuse_pure_results_until_they_expire(self):
+        cache = TTLCache(ttl=0.05)
+        self.memo(cache).call("breed_info", {"breed": "labrador"})
+        self.memo(cache).call("weather", {"city": "Oslo"})
+
+        self.assertEqual(
+            self.memo(cache).call("breed_info", {"breed": "labrador"}),
+            "Labradors are friendly.",
+        )
+        # Not pure: never cached across runs
+        self.memo(cache).call("weather", {"city": "Oslo"})
+        self.assertEqual(self.tools.runs, 3)
+
+        time.sleep(0.06)
+        self.memo(cache).call("breed_info", {"breed": "labrador"})
+        self.assertEqual(self.tools.runs, 4)
+        self.assertEqual(self.sources(), ["tool", "tool", "cache", "tool", "tool"])
+
+    def test_errors_are_not_cached_across_runs(self):
+        cache = TTLCache()
+        result = self.memo(cache).call("breed_info", {})
+        self.assertTrue(result.startswith("Error:"))
+        self.assertEqual(len(cache._entries), 0)
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0.05)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("a", "gone"), "gone")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = TTLCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import re
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from common.tracing import NOOP_SPAN, InMemoryExporter, Tracer, propagate
+
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = Tracer(self.exporter)
+
+    def span_named(self, name: str):
+        return next(span for span in self.exporter.spans() if span.name == name)
+
+    def test_spans_nest_and_render_as_a_tree(self):
+        with self.tracer.span("agent.run", agent="react") as run:
+            with self.tracer.span("llm.call", model="fake") as call:
+                call.set(tokens=12)
+            with self.assertRaises(KeyError):
+                with self.tracer.span("tool.call", tool="breed_info"):
+                    raise KeyError("labrador")
+
+        llm, tool = self.span_named("llm.call"), self.span_named("tool.call")
+        self.assertIsNone(run.parent_id)
+        self.assertEqual((llm.parent_id, tool.parent_id), (run.span_id, run.span_id))
+        self.assertEqual(
+            {span.trace_id for span in self.exporter.spans()}, {run.trace_id}
+        )
+        self.assertEqual(llm.attributes, {"model": "fake", "tokens": 12})
+        self.assertEqual(tool.error, "KeyError: 'labrador'")
+
+        lines = self.exporter.render().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertRegex(lines[0], r"^agent\.run \d+\.\dms agent=react$")
+        self.assertRegex(lines[1], r"^  llm\.call \d+\.\dms model=fake tokens=12$")
+        self.assertRegex(
+            lines[2],
+            r"^  tool\.call \d+\.\dms tool=breed_info error="
+            + re.escape(repr(tool.error))
+            + "$",
+        )
+
+    def test_propagate_carries_the_parent_span_to_other_threads(self):
+        def work(name: str) -> str:
+            with self.tracer.span(name) as span:
+                return span.parent_id
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with self.tracer.span("agent.run") as run:
+                propagated = pool.submit(propagate(work), "propagated").result()
+                detached = pool.submit(work, "detached").result()
+
+        self.assertEqual(propagated, run.span_id)
+        self.assertEqual(self.span_named("propagated").trace_id, run.trace_id)
+        self.assertIsNone(detached)
+        self.assertNotEqual(self.span_named("detached").trace_id, run.trace_id)
+
+    def test_unsampled_traces_record_nothing(self):
+        tracer = Tracer(self.exporter, sample_rate=0.0)
+        with tracer.span("agent.run") as run:
+            with tracer.span("llm.call") as call:
+                call.set(tokens=12)
+        self.assertIs(run, NOOP_SPAN)
+        self.assertIs(call, NOOP_SPAN)
+        self.assertEqual(self.exporter.spans(), [])
+        self.assertIs(Tracer().span("agent.run"), NOOP_SPAN)
+
+
+if __name__ == "__main__":
+    unittest.main()